@@ -0,0 +1,162 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from io import BytesIO
+
+import numpy as np
+import requests
+from PIL import Image, ImageDraw
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from slides import cargar_fuente
+
+# Constantes
+ASSET_CACHE_DIR = os.path.join("cache", "assets")
+ASSET_CONNECT_TIMEOUT = 3.05
+ASSET_READ_TIMEOUT = 10
+ASSET_REVALIDATE_SECONDS = 3600
+
+
+def _nueva_sesion():
+    """Creates a pooled session that retries transient server errors."""
+    session = requests.Session()
+    retry = Retry(total=2, backoff_factor=0.3, status_forcelist=(502, 503, 504),
+                  allowed_methods=("GET",))
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class AssetFetcher:
+    """Downloads remote assets through a pooled session with an on-disk HTTP cache."""
+
+    def __init__(self, cache_dir=ASSET_CACHE_DIR, session=None,
+                 timeout=(ASSET_CONNECT_TIMEOUT, ASSET_READ_TIMEOUT),
+                 revalidate_after=ASSET_REVALIDATE_SECONDS):
+        self.cache_dir = cache_dir
+        self.session = session or _nueva_sesion()
+        self.timeout = timeout
+        self.revalidate_after = revalidate_after
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _rutas(self, url):
+        clave = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        base = os.path.join(self.cache_dir, clave)
+        return base + ".bin", base + ".json"
+
+    def fetch(self, url):
+        """Returns the asset bytes, revalidating the cached copy with ETag/Last-Modified."""
+        ruta_datos, ruta_meta = self._rutas(url)
+        meta = {}
+        if os.path.exists(ruta_datos) and os.path.exists(ruta_meta):
+            with open(ruta_meta, encoding="utf-8") as f:
+                meta = json.load(f)
+            if time.time() - meta.get("checked", 0) < self.revalidate_after:
+                with open(ruta_datos, "rb") as f:
+                    return f.read()
+
+        headers = {}
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+        try:
+            response = self.session.get(url, headers=headers, timeout=self.timeout)
+            if response.status_code == 304 and meta:
+                with open(ruta_datos, "rb") as f:
+                    datos = f.read()
+            else:
+                response.raise_for_status()
+                datos = response.content
+                meta = {
+                    "url": url,
+                    "etag": response.headers.get("ETag"),
+                    "last_modified": response.headers.get("Last-Modified"),
+                }
+                temporal = f"{ruta_datos}.{threading.get_ident()}.tmp"
+                with open(temporal, "wb") as f:
+                    f.write(datos)
+                os.replace(temporal, ruta_datos)
+        except requests.RequestException as e:
+            if not meta:
+                raise
+            # Ante un fallo de red servimos la copia en disco aunque esté sin revalidar
+            logging.warning(f"No se pudo revalidar {url}, usando copia en caché: {str(e)}")
+            with open(ruta_datos, "rb") as f:
+                return f.read()
+
+        meta["checked"] = time.time()
+        with open(ruta_meta, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        return datos
+
+
+_fetcher = None
+_end_cards = {}
+_lock = threading.Lock()
+
+
+def get_fetcher():
+    """Returns the process-wide asset fetcher."""
+    global _fetcher
+    with _lock:
+        if _fetcher is None:
+            _fetcher = AssetFetcher()
+        return _fetcher
+
+
+def render_subscription_card(logo_bytes, size, font_size, font_path, logo_size):
+    """Draws the subscription end-card, with the logo if one is given."""
+    img = Image.new('RGB', size, (255, 0, 0))
+    draw = ImageDraw.Draw(img)
+    font = cargar_fuente(font_path, font_size)
+    font2 = cargar_fuente(font_path, font_size//2)
+
+    if logo_bytes:
+        logo_img = Image.open(BytesIO(logo_bytes)).convert("RGBA")
+        logo_img = logo_img.resize(logo_size)
+        logo_position = (20, 20)
+        img.paste(logo_img, logo_position, logo_img)
+
+    text1 = "¡SUSCRÍBETE A LECTOR DE SOMBRAS!"
+    left1, top1, right1, bottom1 = draw.textbbox((0, 0), text1, font=font)
+    x1 = (size[0] - (right1 - left1)) // 2
+    y1 = (size[1] - (bottom1 - top1)) // 2 - (bottom1 - top1) // 2 - 20
+    draw.text((x1, y1), text1, font=font, fill="white")
+
+    text2 = "Dale like y activa la campana 🔔"
+    left2, top2, right2, bottom2 = draw.textbbox((0, 0), text2, font=font2)
+    x2 = (size[0] - (right2 - left2)) // 2
+    y2 = (size[1] - (bottom2 - top2)) // 2 + (bottom1 - top1) // 2 + 20
+    draw.text((x2, y2), text2, font=font2, fill="white")
+    return np.array(img)
+
+
+def subscription_card(logo_url, size, font_size, font_path, logo_size, fetcher=None):
+    """Returns the end-card for (logo, size, font size), building it once per process."""
+    clave = (logo_url, tuple(size), font_size, font_path, tuple(logo_size))
+    with _lock:
+        if clave in _end_cards:
+            return _end_cards[clave]
+
+    logo_bytes = None
+    try:
+        logo_bytes = (fetcher or get_fetcher()).fetch(logo_url)
+        frame = render_subscription_card(logo_bytes, size, font_size, font_path, logo_size)
+    except Exception as e:
+        logging.error(f"Error al cargar el logo: {str(e)}")
+        logo_bytes = None
+        frame = render_subscription_card(None, size, font_size, font_path, logo_size)
+
+    frame.flags.writeable = False
+    # Sin logo no guardamos la tarjeta: el próximo video vuelve a intentarlo
+    if logo_bytes:
+        with _lock:
+            _end_cards[clave] = frame
+    return frame
@@ -0,0 +1,111 @@
+import io
+import subprocess
+import wave
+
+import imageio_ffmpeg
+import numpy as np
+
+# Constantes
+AUDIO_SAMPLE_RATE = 24000
+
+
+def decode_linear16(audio_content, sample_rate=AUDIO_SAMPLE_RATE):
+    """Decodes a LINEAR16 response (WAV or raw PCM) into int16 mono samples."""
+    if audio_content[:4] == b"RIFF":
+        with wave.open(io.BytesIO(audio_content), "rb") as w:
+            if w.getsampwidth() != 2:
+                raise Exception(f"Audio LINEAR16 con {w.getsampwidth() * 8} bits no soportado")
+            if w.getframerate() != sample_rate:
+                raise Exception(f"Frecuencia de muestreo inesperada: {w.getframerate()} Hz")
+            muestras = np.frombuffer(w.readframes(w.getnframes()), dtype="<i2")
+            if w.getnchannels() > 1:
+                muestras = muestras.reshape(-1, w.getnchannels()).mean(axis=1).astype("<i2")
+            return muestras
+    return np.frombuffer(audio_content, dtype="<i2")
+
+
+def decode_mp3(audio_content, sample_rate=AUDIO_SAMPLE_RATE):
+    """Decodes an MP3 response into int16 mono samples with ffmpeg."""
+    proceso = subprocess.run(
+        [imageio_ffmpeg.get_ffmpeg_exe(), "-hide_banner", "-loglevel", "error",
+         "-f", "mp3", "-i", "pipe:0", "-f", "s16le", "-ac", "1", "-ar", str(sample_rate), "pipe:1"],
+        input=audio_content, capture_output=True)
+    if proceso.returncode != 0:
+        raise Exception(f"No se pudo decodificar el MP3: {proceso.stderr.decode(errors='replace').strip()}")
+    return np.frombuffer(proceso.stdout, dtype="<i2")
+
+
+def concatenar_pcm(segmentos, sample_rate=AUDIO_SAMPLE_RATE, silencio=0.0):
+    """Joins PCM segments into one buffer and returns it with each segment's duration.
+
+    ``silencio`` seconds of silence are appended after every segment and
+    counted in that segment's duration, so slides stay in sync.
+    """
+    muestras_silencio = int(round(silencio * sample_rate))
+    total = sum(len(s) for s in segmentos) + muestras_silencio * len(segmentos)
+    narracion = np.zeros(total, dtype="<i2")
+    duraciones = []
+    pos = 0
+    for muestras in segmentos:
+        narracion[pos:pos + len(muestras)] = muestras
+        n = len(muestras) + muestras_silencio
+        pos += n
+        duraciones.append(n / sample_rate)
+    return narracion, duraciones
+
+
+def write_wav(path, muestras, sample_rate=AUDIO_SAMPLE_RATE):
+    """Writes int16 mono samples to a WAV file."""
+    with wave.open(path, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(sample_rate)
+        w.writeframes(muestras.astype("<i2").tobytes())
+
+
+def pad_to_frames(muestras, fps, sample_rate=AUDIO_SAMPLE_RATE):
+    """Pads samples with silence up to a whole number of video frames.
+
+    Returns the padded samples and the resulting frame count.
+    """
+    frames = max(1, int(np.ceil(len(muestras) * fps / sample_rate)))
+    total = int(round(frames * sample_rate / fps))
+    if total <= len(muestras):
+        return muestras[:total], frames
+    relleno = np.zeros(total - len(muestras), dtype="<i2")
+    return np.concatenate([muestras, relleno]), frames
+
+
+class NarracionWav:
+    """Appends PCM segments to a WAV file as they arrive instead of joining them in memory.
+
+    Like concatenar_pcm, ``silencio`` seconds are appended after every
+    segment and counted in its duration.
+    """
+
+    def __init__(self, path, sample_rate=AUDIO_SAMPLE_RATE, silencio=0.0):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.silencio = np.zeros(int(round(silencio * sample_rate)), dtype="<i2")
+        self.duracion = 0.0
+        self._wav = wave.open(path, "wb")
+        self._wav.setnchannels(1)
+        self._wav.setsampwidth(2)
+        self._wav.setframerate(sample_rate)
+
+    def append(self, muestras):
+        """Writes one segment and returns its duration in seconds."""
+        self._wav.writeframes(muestras.astype("<i2").tobytes())
+        self._wav.writeframes(self.silencio.tobytes())
+        duracion = (len(muestras) + len(self.silencio)) / self.sample_rate
+        self.duracion += duracion
+        return duracion
+
+    def close(self):
+        self._wav.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,166 @@
+import fcntl
+import hashlib
+import json
+import os
+import threading
+import time
+
+# Constantes
+AUDIO_CACHE_DIR = os.path.join("cache", "tts")
+AUDIO_CACHE_MAX_BYTES = 2 * 1024 ** 3  # 2 GB
+AUDIO_CACHE_RESCAN_BYTES = 64 * 1024 ** 2  # escritos por este proceso antes de medir el directorio otra vez
+AUDIO_CACHE_LOCK = ".lock"
+
+
+def clave_audio(texto, voz, idioma, encoding, speaking_rate):
+    """Builds the content-addressed key for a synthesized segment."""
+    datos = json.dumps([texto, voz, idioma, int(encoding), float(speaking_rate or 1.0)],
+                       ensure_ascii=False)
+    return hashlib.sha256(datos.encode("utf-8")).hexdigest()
+
+
+def clave_desde_config(texto, voice, audio_config):
+    """Builds the cache key from the TTS request objects."""
+    return clave_audio(texto, voice.name, voice.language_code,
+                       audio_config.audio_encoding, audio_config.speaking_rate)
+
+
+class AudioCache:
+    """Persistent on-disk cache of synthesized audio with LRU eviction.
+
+    Several processes (the job workers) can share the directory. Each keeps
+    its own index, and every AUDIO_CACHE_RESCAN_BYTES written (or 1/16 of
+    ``max_bytes`` if smaller) it rebuilds it from the directory under a
+    file lock before evicting, so together they exceed ``max_bytes`` by at
+    most that much per process.
+    """
+
+    def __init__(self, directorio=AUDIO_CACHE_DIR, max_bytes=AUDIO_CACHE_MAX_BYTES):
+        self.directorio = directorio
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+        self.margen = min(AUDIO_CACHE_RESCAN_BYTES, max_bytes // 16)
+        os.makedirs(directorio, exist_ok=True)
+        self._escanear()
+
+    def _escanear(self):
+        """Rebuilds the index from the directory, which other processes may have changed."""
+        # Índice en memoria: clave -> (tamaño, último acceso)
+        self.entradas = {}
+        for entrada in os.scandir(self.directorio):
+            if entrada.name.endswith(".tmp") or entrada.name == AUDIO_CACHE_LOCK:
+                continue
+            try:
+                st_archivo = entrada.stat()
+            except OSError:
+                continue
+            self.entradas[entrada.name] = (st_archivo.st_size, st_archivo.st_mtime)
+        self.total_bytes = sum(tam for tam, _ in self.entradas.values())
+        self.escritos = 0
+
+    def _ruta(self, clave):
+        return os.path.join(self.directorio, clave)
+
+    def __contains__(self, clave):
+        with self.lock:
+            return clave in self.entradas
+
+    def comprobar(self, clave):
+        """Like ``clave in cache``, but counts a miss if the key is absent.
+
+        For callers that check first and read the hits later with get(),
+        which counts them.
+        """
+        with self.lock:
+            if clave in self.entradas:
+                return True
+            self.misses += 1
+            return False
+
+    def get(self, clave):
+        """Returns the cached audio bytes for the key, or None."""
+        with self.lock:
+            if clave not in self.entradas:
+                self.misses += 1
+                return None
+            try:
+                with open(self._ruta(clave), "rb") as f:
+                    datos = f.read()
+            except OSError:
+                # El archivo desapareció por fuera de la caché
+                tam, _ = self.entradas.pop(clave)
+                self.total_bytes -= tam
+                self.misses += 1
+                return None
+            ahora = time.time()
+            os.utime(self._ruta(clave), (ahora, ahora))
+            self.entradas[clave] = (len(datos), ahora)
+            self.hits += 1
+            return datos
+
+    def put(self, clave, datos):
+        """Stores audio bytes under the key, evicting least recently used entries."""
+        if len(datos) > self.max_bytes:
+            return
+        ruta = self._ruta(clave)
+        temporal = f"{ruta}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporal, "wb") as f:
+            f.write(datos)
+        with self.lock:
+            os.replace(temporal, ruta)
+            anterior = self.entradas.get(clave)
+            if anterior:
+                self.total_bytes -= anterior[0]
+            self.entradas[clave] = (len(datos), time.time())
+            self.total_bytes += len(datos)
+            self.escritos += len(datos)
+            if self.total_bytes > self.max_bytes or self.escritos >= self.margen:
+                self._evict()
+
+    def _evict(self):
+        # Otros procesos escriben en el mismo directorio: medimos y desalojamos de uno en uno
+        with open(os.path.join(self.directorio, AUDIO_CACHE_LOCK), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            self._escanear()
+            self._desalojar()
+
+    def _desalojar(self):
+        if self.total_bytes <= self.max_bytes:
+            return
+        for clave, (tam, _) in sorted(self.entradas.items(), key=lambda e: e[1][1]):
+            if self.total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(self._ruta(clave))
+            except OSError:
+                pass
+            del self.entradas[clave]
+            self.total_bytes -= tam
+            self.evictions += 1
+
+    def stats(self):
+        """Returns the hit/miss counters and current size."""
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self.entradas),
+                "bytes": self.total_bytes,
+            }
+
+
+_cache_por_defecto = None
+_cache_lock = threading.Lock()
+
+
+def get_default_cache():
+    """Returns the process-wide audio cache."""
+    global _cache_por_defecto
+    with _cache_lock:
+        if _cache_por_defecto is None:
+            _cache_por_defecto = AudioCache()
+        return _cache_por_defecto
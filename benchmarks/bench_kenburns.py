@@ -0,0 +1,115 @@
+"""Frame throughput of the Ken Burns background against still slides.
+
+Measures frames/second for several ways of producing the frames of one
+slide with a background photo:
+
+- fija: the cached still slide (what the moviepy backend encodes today)
+- zoom / desplazamiento: KenBurnsSlide zooming (one resample per frame)
+  or panning (a slice per frame), with the cached text mask blended on top
+- ingenuo: resizing the full photo and drawing the text on every frame,
+  as a per-frame moviepy resize lambda would
+
+and, with --codificar, the same frames encoded by moviepy/x264.
+
+Usage: python benchmarks/bench_kenburns.py [--frames 240] [--foto 4000x3000] [--codificar]
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from kenburns import KenBurnsSlide, Piramide, tamano_base, KENBURNS_ZOOM  # noqa: E402
+from slides import SlideRenderer  # noqa: E402
+from timeline import SlideTimeline  # noqa: E402
+
+FONT_PATH = "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"
+SIZE = (1280, 720)
+FPS = 24
+SEGMENTO = ("Era una noche oscura y tormentosa cuando el viejo faro dejó de girar. "
+            "Los pescadores del pueblo miraron hacia la costa sin comprender qué había "
+            "ocurrido, y el silencio se extendió por las calles empedradas.")
+
+
+def generar_foto(ruta, size):
+    """Writes a synthetic photo with detail at every scale."""
+    y, x = np.mgrid[0:size[1], 0:size[0]].astype(np.float32)
+    rgb = np.stack([128 + 100 * np.sin(x / 37.0) * np.cos(y / 53.0),
+                    128 + 100 * np.sin((x + y) / 91.0),
+                    128 + 60 * np.cos(x / 7.0) + 40 * np.sin(y / 5.0)], axis=-1)
+    Image.fromarray(np.clip(rgb, 0, 255).astype(np.uint8)).save(ruta, quality=90)
+
+
+def medir(fn, frames):
+    inicio = time.perf_counter()
+    for k in range(frames):
+        fn(k / FPS)
+    return frames / (time.perf_counter() - inicio)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=240)
+    parser.add_argument("--foto", default="4000x3000", help="tamaño de la imagen de fondo")
+    parser.add_argument("--codificar", action="store_true", help="mide también la codificación con moviepy")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    work_dir = tempfile.mkdtemp(prefix="bench_kenburns_")
+    foto = os.path.join(work_dir, "fondo.jpg")
+    generar_foto(foto, tuple(int(v) for v in args.foto.split("x")))
+    duracion = args.frames / FPS
+    renderer = SlideRenderer(FONT_PATH)
+
+    inicio = time.perf_counter()
+    piramide = Piramide(renderer.canvas(tamano_base(SIZE), "black", foto, True), SIZE)
+    preparacion = time.perf_counter() - inicio
+    mascara = renderer.text_mask(SEGMENTO, SIZE, 40)
+
+    fija = renderer.text_image(SEGMENTO, SIZE, 40, background_image=foto, stretch_background=True)
+    zoom = KenBurnsSlide(piramide, SIZE, mascara, duracion, "white", movimiento=0).frame
+    desplazamiento = KenBurnsSlide(piramide, SIZE, mascara, duracion, "white", movimiento=1).frame
+
+    original = Image.open(foto).convert("RGB")
+    layout = renderer.layout(SEGMENTO, SIZE, 40)
+
+    def ingenuo(t):
+        zoom = 1 + (KENBURNS_ZOOM - 1) * t / duracion
+        ancho, alto = original.width / zoom, original.height / zoom
+        x0, y0 = (original.width - ancho) / 2, (original.height - alto) / 2
+        img = original.crop((int(x0), int(y0), int(x0 + ancho), int(y0 + alto))).resize(SIZE, Image.LANCZOS)
+        layout.draw(ImageDraw.Draw(img), SIZE, "white")
+        return np.asarray(img)
+
+    caminos = {"fija": lambda t: fija, "zoom": zoom, "desplazamiento": desplazamiento,
+               "ingenuo": ingenuo}
+    resultado = {
+        "frames": args.frames,
+        "foto": args.foto,
+        "preparacion_fondo_ms": round(preparacion * 1000, 1),
+        "niveles_piramide": len(piramide.niveles),
+        "generacion_fps": {nombre: round(medir(fn, args.frames), 1) for nombre, fn in caminos.items()},
+    }
+
+    if args.codificar:
+        resultado["codificacion_fps"] = {}
+        for nombre, fn in caminos.items():
+            timeline = SlideTimeline()
+            timeline.add(lambda fn=fn: fn, duracion, dinamica=True)
+            inicio = time.perf_counter()
+            timeline.clip().write_videofile(os.path.join(work_dir, f"{nombre}.mp4"), fps=FPS,
+                                            codec="libx264", preset="ultrafast", audio=False,
+                                            threads=4, logger=None)
+            resultado["codificacion_fps"][nombre] = round(args.frames / (time.perf_counter() - inicio), 1)
+
+    print(json.dumps(resultado, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Compares the layout engine against the original textbbox wrap loop.
+
+Usage: python benchmarks/bench_layout.py [--repeticiones N]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+from PIL import Image, ImageDraw, ImageFont
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from slides import SlideRenderer  # noqa: E402
+
+FONT_PATH = "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"
+SIZE = (1280, 720)
+SEGMENTO = ("Era una noche oscura y tormentosa cuando el viejo faro dejó de girar. "
+            "Los pescadores del pueblo miraron hacia la costa sin comprender qué había "
+            "ocurrido, y el silencio se extendió por las calles empedradas mientras la "
+            "lluvia golpeaba los tejados con una insistencia casi humana.")
+
+
+def wrap_textbbox(text, size, font_size):
+    """Original quadratic wrap loop from create_text_image."""
+    img = Image.new('RGB', size, "black")
+    draw = ImageDraw.Draw(img)
+    font = ImageFont.truetype(FONT_PATH, font_size)
+    words = text.split()
+    lines = []
+    current_line = []
+    for word in words:
+        current_line.append(word)
+        test_line = ' '.join(current_line)
+        left, top, right, bottom = draw.textbbox((0, 0), test_line, font=font)
+        if right > size[0] - 60:
+            current_line.pop()
+            lines.append(' '.join(current_line))
+            current_line = [word]
+    lines.append(' '.join(current_line))
+    return lines
+
+
+def medir(fn, repeticiones):
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        fn()
+    return (time.perf_counter() - inicio) * 1000 / repeticiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeticiones", type=int, default=20)
+    args = parser.parse_args()
+
+    resultados = []
+    for font_size in range(10, 101, 10):
+        # Un renderer nuevo por medición para no medir la caché de layouts
+        def nuevo():
+            SlideRenderer(FONT_PATH).layout(SEGMENTO, SIZE, font_size)
+
+        renderer = SlideRenderer(FONT_PATH)
+        layout = renderer.layout(SEGMENTO, SIZE, font_size)
+
+        # Renderer caliente: fuentes y medidas ya cargadas, como dentro de un video
+        def caliente():
+            renderer._layouts.clear()
+            renderer.layout(SEGMENTO, SIZE, font_size)
+        resultados.append({
+            "font_size": font_size,
+            "textbbox_ms": round(medir(lambda: wrap_textbbox(SEGMENTO, SIZE, font_size),
+                                       args.repeticiones), 3),
+            "layout_ms": round(medir(nuevo, args.repeticiones), 3),
+            "layout_warm_ms": round(medir(caliente, args.repeticiones), 3),
+            "layout_font_size": layout.font_size,
+            "lines": len(layout.lines),
+        })
+    print(json.dumps({"chars": len(SEGMENTO), "results": resultados}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
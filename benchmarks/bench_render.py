@@ -0,0 +1,176 @@
+"""End-to-end render benchmark that runs offline against a stub TTS client.
+
+Each (backend, corpus) case runs in its own process so peak RSS is not
+shared between cases. Stage times are taken from the progress callbacks of
+create_simple_video; for the progressive backend, whose stages interleave,
+they are the time until each stage last reported. Peak RSS is that of the
+render process; ffmpeg child processes are not included.
+
+Usage: python benchmarks/bench_render.py [--backends ffmpeg,paralelo] [--corpus pequeno,mediano]
+                                         [--latencia 0.05] [--lotes] [--pcm]
+                                         [--perfiles 1080p,720p,short] [--borrador]
+                                         [--voces es-ES-Standard-B]
+
+With --borrador each case renders a draft and then its final version with
+the same audio cache, and reports the TTS requests the final one needed.
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import re
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Número de frases de cada texto del corpus
+CORPUS = {"pequeno": 20, "mediano": 200, "libro": 3000}
+PALABRAS = ("el faro la costa noche viento barco puerto lluvia calle pueblo silencio "
+            "pescador ventana camino sombra luz mar piedra tormenta voz carta casa "
+            "viejo oscuro largo frío lento antiguo callado lejano húmedo extraño").split()
+
+
+def generar_texto(frases, semilla=0):
+    """Builds a deterministic pseudo-Spanish text with the given number of sentences."""
+    rnd = random.Random(semilla)
+    return " ".join(" ".join(rnd.choice(PALABRAS) for _ in range(rnd.randint(8, 24))).capitalize() + "."
+                    for _ in range(frases))
+
+
+def duracion_video(ruta, ffmpeg):
+    """Reads the container duration reported by ffmpeg, in seconds."""
+    salida = subprocess.run([ffmpeg, "-hide_banner", "-i", ruta], capture_output=True, text=True).stderr
+    h, m, s = re.search(r"Duration: (\d+):(\d+):([\d.]+)", salida).groups()
+    return int(h) * 3600 + int(m) * 60 + float(s)
+
+
+def ejecutar_caso(backend, corpus, latencia, lotes, pcm, perfiles=None, borrador=False, voces=None):
+    from audio_cache import AudioCache
+    from encoder import ffmpeg_exe
+    from stub_tts import StubTTSClient
+    from video import create_simple_video, segmentar_texto, ruta_perfil, VIDEO_FPS, DRAFT_FPS
+
+    texto = generar_texto(CORPUS[corpus])
+    work_dir = tempfile.mkdtemp(prefix="bench_render_")
+    client = StubTTSClient(latencia=latencia, ffmpeg=ffmpeg_exe())
+    fin_etapa = {}
+
+    def progress(etapa, actual, total):
+        fin_etapa[etapa] = time.perf_counter()
+
+    try:
+        inicio = time.perf_counter()
+        segmentos = segmentar_texto(texto)
+        tiempos = {"segmentacion": time.perf_counter() - inicio}
+
+        inicio = time.perf_counter()
+        nombre_salida = os.path.join(work_dir, "salida.mp4")
+        ok, mensaje = create_simple_video(
+            texto, nombre_salida, "es-ES-Standard-A", "http://127.0.0.1:9/logo.png", 40,
+            "#000000", "#ffffff", None, False, backend=backend, audio_pcm=pcm, tts_lotes=lotes,
+            audio_cache=AudioCache(os.path.join(work_dir, "cache")), work_dir=work_dir,
+            manifest_dir=os.path.join(work_dir, "manifest"), progress=progress, client=client,
+            perfiles=perfiles, borrador=borrador, voces_adicionales=voces)
+        total = time.perf_counter() - inicio
+        if not ok:
+            raise Exception(mensaje)
+
+        anterior = inicio
+        for etapa in ("sintesis", "diapositivas", "codificacion"):
+            fin = fin_etapa.get(etapa, anterior)
+            tiempos[etapa] = max(0.0, fin - anterior)
+            anterior = max(anterior, fin)
+        tiempos["codificacion"] += inicio + total - anterior
+
+        salidas = [ruta_perfil(nombre_salida, p) for p in perfiles] if perfiles else [nombre_salida]
+        duracion = duracion_video(salidas[0], ffmpeg_exe())
+        # Con varias versiones se cuentan los fotogramas de todas
+        frames = int(round(duracion * (DRAFT_FPS if borrador else VIDEO_FPS))) * len(salidas)
+        render = tiempos["diapositivas"] + tiempos["codificacion"]
+        resultado = {
+            "backend": backend,
+            "corpus": corpus,
+            "chars": len(texto),
+            "segments": len(segmentos),
+            "tts_requests": client.llamadas,
+            "stages_s": {k: round(v, 3) for k, v in tiempos.items()},
+            "total_s": round(total, 3),
+            "video_s": round(duracion, 2),
+            "frames": frames,
+            "render_fps": round(frames / render, 1) if render else None,
+            "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+            "renditions": len(salidas),
+            "audio_tracks": 1 + len(voces or []),
+            "output_bytes": sum(os.path.getsize(s) for s in salidas),
+        }
+        if borrador:
+            # Promoción: la versión final con la misma caché de audio
+            peticiones = client.llamadas
+            inicio = time.perf_counter()
+            ok, mensaje = create_simple_video(
+                texto, os.path.join(work_dir, "final.mp4"), "es-ES-Standard-A",
+                "http://127.0.0.1:9/logo.png", 40, "#000000", "#ffffff", None, False,
+                backend=backend, audio_pcm=pcm, tts_lotes=lotes,
+                audio_cache=AudioCache(os.path.join(work_dir, "cache")), work_dir=work_dir,
+                manifest_dir=os.path.join(work_dir, "manifest"), client=client, perfiles=perfiles)
+            if not ok:
+                raise Exception(mensaje)
+            resultado["promocion_s"] = round(time.perf_counter() - inicio, 3)
+            resultado["promocion_tts_requests"] = client.llamadas - peticiones
+        return resultado
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", default="moviepy,ffmpeg,paralelo")
+    parser.add_argument("--corpus", default="pequeno,mediano")
+    parser.add_argument("--latencia", type=float, default=0.05, help="segundos por petición TTS")
+    parser.add_argument("--lotes", action="store_true", help="síntesis por lotes SSML")
+    parser.add_argument("--pcm", action="store_true", help="audio PCM en memoria")
+    parser.add_argument("--perfiles", help="versiones de salida separadas por comas, p. ej. 1080p,720p,short")
+    parser.add_argument("--voces", help="voces adicionales separadas por comas (una pista por voz)")
+    parser.add_argument("--borrador", action="store_true", help="borrador rápido y su promoción")
+    parser.add_argument("--caso", nargs=2, metavar=("BACKEND", "CORPUS"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    if args.caso:
+        perfiles = args.perfiles.split(",") if args.perfiles else None
+        voces = args.voces.split(",") if args.voces else None
+        print(json.dumps(ejecutar_caso(*args.caso, args.latencia, args.lotes, args.pcm, perfiles,
+                                       args.borrador, voces)))
+        return
+
+    resultados = []
+    for corpus in args.corpus.split(","):
+        for backend in args.backends.split(","):
+            comando = [sys.executable, os.path.abspath(__file__), "--caso", backend, corpus,
+                       "--latencia", str(args.latencia)]
+            comando += ["--lotes"] * args.lotes + ["--pcm"] * args.pcm + ["--borrador"] * args.borrador
+            if args.perfiles:
+                comando += ["--perfiles", args.perfiles]
+            if args.voces:
+                comando += ["--voces", args.voces]
+            proceso = subprocess.run(comando, capture_output=True, text=True)
+            if proceso.returncode != 0:
+                resultados.append({"backend": backend, "corpus": corpus,
+                                   "error": proceso.stderr.strip().splitlines()[-1:]})
+                continue
+            resultados.append(json.loads(proceso.stdout.strip().splitlines()[-1]))
+            print(f"{corpus}/{backend}: {resultados[-1]['total_s']} s", file=sys.stderr)
+    print(json.dumps({"latencia_tts_s": args.latencia, "lotes": args.lotes, "pcm": args.pcm,
+                      "perfiles": args.perfiles, "borrador": args.borrador, "voces": args.voces,
+                      "results": resultados}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Offline stand-in for the Google TTS client used by the benchmarks.
+
+Returns deterministic audio as LINEAR16 or MP3. Its length follows the
+text at about 150 words per minute, with each voice up to 10% faster or
+slower so multi-voice renders have narrations of different lengths. SSML
+marks are honoured with timepoints, so the batched synthesis path can be
+measured too.
+"""
+import io
+import re
+import subprocess
+import threading
+import time
+import wave
+import zlib
+
+import numpy as np
+from google.cloud import texttospeech, texttospeech_v1beta1
+
+PALABRAS_POR_SEGUNDO = 2.5
+SAMPLE_RATE = 24000
+
+_MARCA = re.compile(r'<mark name="([^"]+)"/>')
+_ETIQUETA = re.compile(r"<[^>]+>")
+
+
+def _duracion(texto, ritmo=1.0):
+    return max(0.5, len(texto.split()) / PALABRAS_POR_SEGUNDO / ritmo)
+
+
+def _ritmo(voice):
+    # Cada voz habla a su ritmo, para que las narraciones de varias voces no duren lo mismo
+    nombre = getattr(voice, "name", "") or ""
+    return 1.0 + (zlib.crc32(nombre.encode("utf-8")) % 21 - 10) / 100
+
+
+def _tono(segundos, frecuencia):
+    t = np.arange(int(round(segundos * SAMPLE_RATE))) / SAMPLE_RATE
+    return (np.sin(2 * np.pi * frecuencia * t) * 6000).astype("<i2")
+
+
+class _Respuesta:
+    def __init__(self, audio_content, timepoints=()):
+        self.audio_content = audio_content
+        self.timepoints = list(timepoints)
+
+
+class StubTTSClient:
+    """Drop-in for texttospeech(.v1beta1).TextToSpeechClient with a fixed latency per call."""
+
+    def __init__(self, latencia=0.05, ffmpeg="ffmpeg"):
+        self.latencia = latencia
+        self.ffmpeg = ffmpeg
+        self.llamadas = 0
+        self._mp3 = {}
+        self._lock = threading.Lock()
+
+    def synthesize_speech(self, input=None, voice=None, audio_config=None, request=None):
+        if request is not None:
+            input, voice, audio_config = request.input, request.voice, request.audio_config
+        ritmo = _ritmo(voice)
+        with self._lock:
+            self.llamadas += 1
+        time.sleep(self.latencia)
+
+        if input.ssml:
+            # Cada marca queda al inicio del texto que la sigue
+            partes = _MARCA.split(input.ssml)
+            previo = _ETIQUETA.sub("", partes[0]).strip()
+            pcm = [_tono(_duracion(previo, ritmo), 220)] if previo else []
+            timepoints = []
+            posicion = sum(len(p) for p in pcm)
+            for i in range(1, len(partes), 2):
+                timepoints.append(texttospeech_v1beta1.Timepoint(mark_name=partes[i],
+                                                                 time_seconds=posicion / SAMPLE_RATE))
+                muestras = _tono(_duracion(_ETIQUETA.sub("", partes[i + 1]), ritmo), 220 + 10 * (i % 20))
+                pcm.append(muestras)
+                posicion += len(muestras)
+            muestras = np.concatenate(pcm)
+        else:
+            timepoints = []
+            muestras = _tono(_duracion(input.text, ritmo), 220)
+
+        # Los enums de v1 y v1beta1 no son comparables entre sí: comparamos el valor
+        if int(audio_config.audio_encoding) == int(texttospeech.AudioEncoding.MP3):
+            return _Respuesta(self._a_mp3(muestras), timepoints)
+        buf = io.BytesIO()
+        with wave.open(buf, "wb") as w:
+            w.setnchannels(1)
+            w.setsampwidth(2)
+            w.setframerate(SAMPLE_RATE)
+            w.writeframes(muestras.tobytes())
+        return _Respuesta(buf.getvalue(), timepoints)
+
+    def _a_mp3(self, muestras):
+        # El MP3 solo depende de la duración: lo codificamos una vez por longitud
+        clave = len(muestras)
+        if clave not in self._mp3:
+            proceso = subprocess.run([self.ffmpeg, "-loglevel", "error", "-f", "s16le",
+                                      "-ar", str(SAMPLE_RATE), "-ac", "1", "-i", "-",
+                                      "-f", "mp3", "-"],
+                                     input=muestras.tobytes(), capture_output=True, check=True)
+            self._mp3[clave] = proceso.stdout
+        return self._mp3[clave]
@@ -0,0 +1,104 @@
+import json
+import logging
+import os
+import shutil
+import time
+
+from audio import decode_linear16, write_wav
+
+# Constantes
+CHECKPOINT_DIRNAME = "checkpoint"
+CHECKPOINT_VERSION = 1
+CHECKPOINT_MAX_AGE = 7 * 24 * 3600  # segundos sin actividad antes de descartar un checkpoint
+
+
+class RenderCheckpoint:
+    """Finished segments of an interrupted render, kept so a re-run resumes where it stopped.
+
+    Each segment's decoded audio (WAV) and slides (PNG) are written under
+    their final name with an atomic rename, so a file that exists is
+    complete. ``clave`` identifies the render inputs; a checkpoint left by
+    a render with other inputs is discarded.
+    """
+
+    def __init__(self, directorio, clave):
+        self.directorio = directorio
+        self.clave = clave
+        self.ruta = os.path.join(directorio, "checkpoint.json")
+        datos = {}
+        if os.path.exists(self.ruta):
+            try:
+                with open(self.ruta, encoding="utf-8") as f:
+                    datos = json.load(f)
+            except (OSError, ValueError) as e:
+                logging.warning(f"Checkpoint ilegible en {self.ruta}, se descarta: {str(e)}")
+        if datos.get("version") != CHECKPOINT_VERSION or datos.get("clave") != clave:
+            if datos:
+                logging.info(f"El checkpoint de {directorio} es de otro render, se descarta")
+            shutil.rmtree(directorio, ignore_errors=True)
+        os.makedirs(directorio, exist_ok=True)
+        self._guardar_indice()
+
+    def _guardar_indice(self):
+        temporal = self.ruta + ".tmp"
+        with open(temporal, "w", encoding="utf-8") as f:
+            json.dump({"version": CHECKPOINT_VERSION, "clave": self.clave,
+                       "actualizado": time.time()}, f)
+        os.replace(temporal, self.ruta)
+
+    def audio_path(self, i, pista=0):
+        """Audio of segment ``i``; ``pista`` > 0 are the extra voices of a multi-voice render."""
+        return os.path.join(self.directorio, f"audio_{i}.wav" if pista == 0 else f"audio_{i}_{pista}.wav")
+
+    def slide_path(self, i, perfil):
+        return os.path.join(self.directorio, f"slide_{perfil}_{i}.png")
+
+    def segmentos_con_audio(self, total, pistas=1):
+        """Returns the indices below ``total`` whose audio is stored for all ``pistas`` voices."""
+        return {i for i in range(total)
+                if all(os.path.exists(self.audio_path(i, k)) for k in range(pistas))}
+
+    def audio(self, i, pista=0):
+        with open(self.audio_path(i, pista), "rb") as f:
+            return decode_linear16(f.read())
+
+    def inicios(self, i):
+        """Returns the word start times stored with segment ``i``, or None."""
+        try:
+            with open(os.path.join(self.directorio, f"palabras_{i}.json"), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def guardar_audio(self, i, muestras, inicios=None, pista=0):
+        if inicios is not None:
+            # Antes que el audio: un segmento con audio está completo
+            with open(os.path.join(self.directorio, f"palabras_{i}.json"), "w", encoding="utf-8") as f:
+                json.dump(inicios, f)
+        destino = self.audio_path(i, pista)
+        temporal = destino + ".tmp"
+        write_wav(temporal, muestras)
+        os.replace(temporal, destino)
+
+    def guardar_slide(self, i, perfil, imagen):
+        """Saves a PIL image as the slide of segment ``i`` for one rendition."""
+        destino = self.slide_path(i, perfil)
+        temporal = destino + ".tmp"
+        imagen.save(temporal, format="PNG", compress_level=1)
+        os.replace(temporal, destino)
+        return destino
+
+    def eliminar(self):
+        """Removes the checkpoint once the render has finished."""
+        shutil.rmtree(self.directorio, ignore_errors=True)
+
+
+def checkpoint_abandonado(directorio, max_age=CHECKPOINT_MAX_AGE):
+    """True if nothing in the checkpoint directory changed for ``max_age`` seconds."""
+    ultimo = os.path.getmtime(directorio)
+    for nombre in os.listdir(directorio):
+        try:
+            ultimo = max(ultimo, os.path.getmtime(os.path.join(directorio, nombre)))
+        except OSError:
+            pass
+    return time.time() - ultimo > max_age
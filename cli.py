@@ -0,0 +1,151 @@
+"""Headless batch renderer.
+
+Renders every .txt file of a directory to an .mp4 next to it (or in
+--output-dir), several at a time, sharing one TTS client and audio cache.
+Credentials are taken from the environment (GOOGLE_APPLICATION_CREDENTIALS
+or Application Default Credentials). Each render checkpoints its progress
+under <output-dir>/.checkpoints, so re-running after a failure resumes it.
+
+Usage: python cli.py render --input-dir textos/ [--jobs N] [--backend ffmpeg]
+"""
+import argparse
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+# Constantes
+CLI_JOBS = 2
+CLI_BACKEND = 'ffmpeg'
+
+
+def _pendientes(input_dir, output_dir, force, perfiles=None):
+    """Returns (text, video) paths whose video is missing or older than its text.
+
+    With output profiles every rendition of the video must be up to date.
+    """
+    from video import ruta_perfil
+
+    trabajos = []
+    for nombre in sorted(os.listdir(input_dir)):
+        if not nombre.endswith(".txt"):
+            continue
+        texto = os.path.join(input_dir, nombre)
+        video = os.path.join(output_dir, os.path.splitext(nombre)[0] + ".mp4")
+        salidas = [ruta_perfil(video, p) for p in perfiles] if perfiles else [video]
+        if not force and all(os.path.exists(s) and os.path.getmtime(s) >= os.path.getmtime(texto)
+                             for s in salidas):
+            logging.info(f"{video} ya está al día, se omite")
+            continue
+        trabajos.append((texto, video))
+    return trabajos
+
+
+def render(args):
+    # Las dependencias pesadas solo se cargan al renderizar, no para --help
+    from concurrent.futures import ThreadPoolExecutor
+    from video import create_simple_video, resolver_perfiles, VOCES_DISPONIBLES, LOGO_URL
+    from tts import TTS_REQUESTS_PER_MINUTE
+    from resources import get_registry
+
+    if args.voz not in VOCES_DISPONIBLES:
+        sys.exit(f"Voz desconocida: {args.voz}. Disponibles: {', '.join(VOCES_DISPONIBLES)}")
+    perfiles = args.perfiles.split(",") if args.perfiles else None
+    voces = args.voces_adicionales.split(",") if args.voces_adicionales else None
+    for voz in voces or []:
+        if voz not in VOCES_DISPONIBLES:
+            sys.exit(f"Voz desconocida: {voz}. Disponibles: {', '.join(VOCES_DISPONIBLES)}")
+    if perfiles:
+        try:
+            resolver_perfiles(perfiles)
+        except Exception as e:
+            sys.exit(str(e))
+    if "GOOGLE_APPLICATION_CREDENTIALS" not in os.environ:
+        logging.warning("GOOGLE_APPLICATION_CREDENTIALS no está definida; "
+                        "se usarán las credenciales por defecto de la aplicación")
+
+    output_dir = args.output_dir or args.input_dir
+    os.makedirs(output_dir, exist_ok=True)
+    trabajos = _pendientes(args.input_dir, output_dir, args.force, perfiles)
+    if not trabajos:
+        print("No hay textos pendientes")
+        return 0
+
+    # El cliente TTS y la tarjeta final se comparten entre todos los renders
+    get_registry().precalentar(beta=args.lotes or args.karaoke, logo_url=args.logo_url or LOGO_URL)
+    # Cada render tiene su propio limitador: repartimos la cuota entre los trabajos
+    rpm = (args.requests_per_minute or TTS_REQUESTS_PER_MINUTE) / args.jobs
+
+    def _uno(texto_path, video_path):
+        with open(texto_path, encoding="utf-8") as f:
+            texto = f.read()
+        inicio = time.time()
+        # Cada render con su directorio temporal: los trabajos en paralelo no comparten archivos
+        work_dir = tempfile.mkdtemp(prefix=".render_", dir=output_dir)
+        try:
+            ok, mensaje = create_simple_video(
+                texto, video_path, args.voz, args.logo_url or LOGO_URL, args.font_size,
+                args.bg_color, args.text_color, args.background_image, args.stretch_background,
+                requests_per_minute=rpm, backend=args.backend, audio_pcm=args.pcm,
+                tts_lotes=args.lotes, perfiles=perfiles, karaoke=args.karaoke,
+                movimiento_fondo=args.movimiento, voces_adicionales=voces,
+                work_dir=work_dir, preview_dir=os.path.join(work_dir, "hls"),
+                checkpoint_dir=os.path.join(output_dir, ".checkpoints",
+                                            os.path.splitext(os.path.basename(video_path))[0]))
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        return ok, mensaje, time.time() - inicio
+
+    fallos = 0
+    with ThreadPoolExecutor(max_workers=args.jobs) as pool:
+        futuros = {pool.submit(_uno, t, v): v for t, v in trabajos}
+        for futuro, video_path in futuros.items():
+            try:
+                ok, mensaje, segundos = futuro.result()
+            except Exception as e:
+                ok, mensaje, segundos = False, str(e), 0.0
+            fallos += not ok
+            print(f"{'OK   ' if ok else 'ERROR'} {video_path} ({segundos:.1f} s){'' if ok else ': ' + mensaje}")
+    return 1 if fallos else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    p = sub.add_parser("render", help="renderiza todos los .txt de un directorio")
+    p.add_argument("--input-dir", required=True)
+    p.add_argument("--output-dir", help="por defecto, el mismo que --input-dir")
+    p.add_argument("--jobs", type=int, default=CLI_JOBS, help="videos en paralelo")
+    p.add_argument("--backend", default=CLI_BACKEND,
+                   choices=("moviepy", "ffmpeg", "paralelo", "progresivo", "incremental", "subtitulos"))
+    p.add_argument("--voz", default="es-ES-Standard-A")
+    p.add_argument("--font-size", type=int, default=30)
+    p.add_argument("--bg-color", default="#000000")
+    p.add_argument("--text-color", default="#ffffff")
+    p.add_argument("--background-image")
+    p.add_argument("--stretch-background", action="store_true")
+    p.add_argument("--logo-url")
+    p.add_argument("--pcm", action="store_true", help="audio PCM en memoria")
+    p.add_argument("--lotes", action="store_true", help="agrupa segmentos en peticiones SSML")
+    p.add_argument("--karaoke", action="store_true",
+                   help="resalta la palabra que se está leyendo (solo --backend moviepy)")
+    p.add_argument("--movimiento", action="store_true",
+                   help="desplaza y acerca la imagen de fondo (solo --backend moviepy)")
+    p.add_argument("--voces-adicionales", help="otras voces separadas por comas: una pista de audio "
+                                               "por voz y una copia <nombre>_<voz>.mp4 de cada una")
+    p.add_argument("--requests-per-minute", type=int, help="cuota TTS total para todos los trabajos")
+    p.add_argument("--perfiles", help="versiones de salida separadas por comas (1080p,720p,short); "
+                                      "cada una se guarda como <nombre>_<perfil>.mp4")
+    p.add_argument("--force", action="store_true", help="vuelve a renderizar aunque el video esté al día")
+    p.set_defaults(func=render)
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
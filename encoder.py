@@ -0,0 +1,394 @@
+import hashlib
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import imageio_ffmpeg
+
+# Constantes
+VIDEO_FPS = 24
+VIDEO_CODEC = 'libx264'
+AUDIO_CODEC = 'aac'
+VIDEO_PRESET = 'ultrafast'
+VIDEO_THREADS = 4
+ENCODE_WORKERS = os.cpu_count() or 1
+HLS_SAMPLE_RATE = 24000
+SUBTITLE_LANGUAGE = 'spa'
+AUDIO_LANGUAGE = 'spa'
+
+
+def ffmpeg_exe():
+    """Returns the ffmpeg binary bundled with imageio-ffmpeg."""
+    return imageio_ffmpeg.get_ffmpeg_exe()
+
+
+def run_ffmpeg(args, duracion_total=None, progress=None):
+    """Runs ffmpeg with the given arguments, raising on failure.
+
+    If ``progress`` is given it is called with the encoded fraction (0-1)
+    of ``duracion_total`` seconds as ffmpeg reports it.
+    """
+    cmd = [ffmpeg_exe(), "-hide_banner", "-loglevel", "error", "-y"]
+    if progress and duracion_total:
+        cmd += ["-progress", "pipe:1", "-nostats"]
+    cmd += args
+    logging.info(f"Ejecutando: {' '.join(cmd)}")
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    for linea in proc.stdout:
+        if linea.startswith(b"out_time_ms=") and progress and duracion_total:
+            try:
+                # A pesar del nombre, ffmpeg informa microsegundos
+                segundos = int(linea.split(b"=")[1]) / 1e6
+            except ValueError:
+                continue
+            progress(min(1.0, segundos / duracion_total))
+    stderr = proc.stderr.read()
+    if proc.wait() != 0:
+        raise Exception(f"ffmpeg falló: {stderr.decode('utf-8', 'replace').strip()}")
+
+
+def calidad_x264(crf=None, bitrate=None):
+    """Returns the x264 rate-control arguments for a CRF and/or a bitrate cap in kbit/s."""
+    args = []
+    if crf is not None:
+        args += ["-crf", str(crf)]
+    if bitrate:
+        # VBV con un búfer de dos segundos: limita los picos sin fijar un bitrate constante
+        args += ["-maxrate", f"{bitrate}k", "-bufsize", f"{2 * bitrate}k"]
+    return args
+
+
+def _escape_concat(path):
+    return os.path.abspath(path).replace("'", "'\\''")
+
+
+def write_concat_list(path, archivos, duraciones=None):
+    """Writes an ffconcat list, optionally with a duration per entry."""
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("ffconcat version 1.0\n")
+        for i, archivo in enumerate(archivos):
+            f.write(f"file '{_escape_concat(archivo)}'\n")
+            if duraciones is not None:
+                f.write(f"duration {duraciones[i]:.6f}\n")
+        if duraciones is not None and archivos:
+            # El demuxer ignora la duración de la última imagen si no se repite
+            f.write(f"file '{_escape_concat(archivos[-1])}'\n")
+
+
+def _pistas(archivos_audio, pistas_audio):
+    if pistas_audio:
+        return pistas_audio
+    return [(archivos_audio, None)] if archivos_audio else []
+
+
+def _args_audio(work_dir, pistas, primera_entrada):
+    """Returns the input and output args that mux each (files, title) track in order.
+
+    Every track is its files concatenated, encoded once and padded with
+    silence; the caller cuts the output to the video duration.
+    """
+    entradas, salida = [], []
+    for k, (archivos, titulo) in enumerate(pistas):
+        lista = os.path.join(work_dir, f"audio_{k}.ffconcat")
+        write_concat_list(lista, archivos)
+        entradas += ["-f", "concat", "-safe", "0", "-i", lista]
+        salida += ["-map", f"{primera_entrada + k}:a"]
+        if titulo:
+            # MP4 guarda el nombre de la pista en handler_name; title lo usan MKV y otros
+            salida += [f"-metadata:s:a:{k}", f"title={titulo}",
+                       f"-metadata:s:a:{k}", f"handler_name={titulo}",
+                       f"-metadata:s:a:{k}", f"language={AUDIO_LANGUAGE}"]
+    if pistas:
+        salida += ["-c:a", AUDIO_CODEC, "-af", "apad"]
+    return entradas, salida
+
+
+def encode_still_slides(slides, duraciones, archivos_audio, nombre_salida,
+                        fps=VIDEO_FPS, preset=VIDEO_PRESET, threads=VIDEO_THREADS,
+                        progress=None, crf=None, bitrate=None, subtitulos=None, pistas_audio=None):
+    """Encodes a sequence of still slides with exact durations and muxes the narration.
+
+    Each slide image is decoded once and held for its duration, so no frame is
+    composited in Python. Audio is concatenated in order and padded with
+    silence up to the end of the video. ``pistas_audio``, a list of
+    (files, title), replaces ``archivos_audio`` with one audio track per
+    entry over the same video stream. ``crf`` and ``bitrate`` (kbit/s)
+    override the encoder defaults. ``subtitulos`` is an SRT file muxed as a
+    mov_text track.
+    """
+    work_dir = tempfile.mkdtemp(prefix="slides_")
+    try:
+        lista_video = os.path.join(work_dir, "video.ffconcat")
+        write_concat_list(lista_video, slides, duraciones)
+        pistas = _pistas(archivos_audio, pistas_audio)
+        entradas, salida = _args_audio(work_dir, pistas, 1)
+        args = ["-f", "concat", "-safe", "0", "-i", lista_video] + entradas
+        salida = ["-map", "0:v"] + salida
+
+        if subtitulos:
+            args += ["-i", subtitulos]
+            salida += ["-map", f"{1 + len(pistas)}:s", "-c:s", "mov_text",
+                       "-metadata:s:s:0", f"language={SUBTITLE_LANGUAGE}"]
+        if pistas or subtitulos:
+            # El audio con apad no termina nunca: cortamos al final de las diapositivas
+            salida += ["-t", f"{sum(duraciones):.6f}"]
+        args += salida
+
+        # Convertimos a yuv420p antes de duplicar fotogramas: una conversión por diapositiva
+        args += [
+            "-vf", f"format=yuv420p,fps={fps}",
+            "-c:v", VIDEO_CODEC,
+            "-preset", preset,
+            "-tune", "stillimage",
+            "-threads", str(threads),
+        ] + calidad_x264(crf, bitrate) + [
+            "-movflags", "+faststart",
+            nombre_salida,
+        ]
+        run_ffmpeg(args, duracion_total=sum(duraciones), progress=progress)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def frame_counts(duraciones, fps=VIDEO_FPS, inicio=0.0):
+    """Converts durations to per-slide frame counts aligned to the output frame grid.
+
+    ``inicio`` is the timeline position of the first slide, so consecutive
+    calls for consecutive blocks stay on the same grid.
+    """
+    conteos = []
+    acumulado = inicio
+    frame_anterior = int(round(inicio * fps))
+    for duracion in duraciones:
+        acumulado += duracion
+        frame_actual = int(round(acumulado * fps))
+        conteos.append(frame_actual - frame_anterior)
+        frame_anterior = frame_actual
+    return conteos
+
+
+def split_chunks(conteos, num_chunks):
+    """Splits slide indices into contiguous chunks of roughly equal frame count."""
+    total = sum(conteos)
+    objetivo = max(1, total / max(1, num_chunks))
+    chunks = []
+    actual = []
+    frames_actual = 0
+    for i, n in enumerate(conteos):
+        if n <= 0:
+            continue
+        actual.append(i)
+        frames_actual += n
+        if frames_actual >= objetivo and len(chunks) < num_chunks - 1:
+            chunks.append(actual)
+            actual = []
+            frames_actual = 0
+    if actual:
+        chunks.append(actual)
+    return chunks
+
+
+def encode_video_chunk(slides, conteos, salida, fps, preset, threads, crf=None, bitrate=None):
+    """Encodes a video-only chunk with an exact number of frames."""
+    work_dir = tempfile.mkdtemp(prefix="chunk_")
+    try:
+        lista = os.path.join(work_dir, "video.ffconcat")
+        write_concat_list(lista, slides, [n / fps for n in conteos])
+        run_ffmpeg([
+            "-f", "concat", "-safe", "0", "-i", lista,
+            "-vf", f"format=yuv420p,fps={fps}",
+            "-frames:v", str(sum(conteos)),
+            "-an",
+            "-c:v", VIDEO_CODEC,
+            "-preset", preset,
+            "-tune", "stillimage",
+            "-threads", str(threads),
+        ] + calidad_x264(crf, bitrate) + [salida])
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def encode_parallel(slides, duraciones, archivos_audio, nombre_salida,
+                    workers=ENCODE_WORKERS, fps=VIDEO_FPS, preset=VIDEO_PRESET,
+                    progress=None, crf=None, bitrate=None, chunks_dir=None, pistas_audio=None):
+    """Encodes the slide timeline in parallel chunks and joins them without re-encoding.
+
+    Chunk boundaries are snapped to the frame grid so the joined video has
+    exactly the frames of a single encode. The narration is encoded once over
+    the whole timeline, so there are no gaps at chunk boundaries. With
+    ``chunks_dir`` the chunks are kept there, named by their content, and
+    chunks left by an earlier attempt are reused. ``pistas_audio`` is as in
+    encode_still_slides.
+    """
+    workers = max(1, int(workers or 1))
+    conteos = frame_counts(duraciones, fps)
+    chunks = split_chunks(conteos, workers)
+    threads = max(1, (os.cpu_count() or 1) // len(chunks))
+    total_frames = sum(conteos)
+
+    work_dir = tempfile.mkdtemp(prefix="parallel_")
+    try:
+        if chunks_dir:
+            archivos_chunk = []
+            for chunk in chunks:
+                clave = hashlib.sha256(repr(([slides[i] for i in chunk], [conteos[i] for i in chunk],
+                                             fps, preset, crf, bitrate)).encode("utf-8")).hexdigest()
+                archivos_chunk.append(os.path.join(chunks_dir, f"chunk_{clave[:16]}.mp4"))
+        else:
+            archivos_chunk = [os.path.join(work_dir, f"chunk_{k}.mp4") for k in range(len(chunks))]
+        # Cada chunk es un proceso ffmpeg independiente; los hilos solo los lanzan y esperan
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futuros = [None if os.path.exists(archivo)
+                       else pool.submit(_encode_chunk_atomico, [slides[i] for i in chunk],
+                                        [conteos[i] for i in chunk], archivo, fps, preset, threads,
+                                        crf, bitrate)
+                       for chunk, archivo in zip(chunks, archivos_chunk)]
+            reutilizados = futuros.count(None)
+            if reutilizados:
+                logging.info(f"{reutilizados} chunks reutilizados de un intento anterior")
+            frames_hechos = 0
+            for chunk, futuro in zip(chunks, futuros):
+                if futuro is not None:
+                    futuro.result()
+                frames_hechos += sum(conteos[i] for i in chunk)
+                if progress:
+                    progress(frames_hechos / total_frames)
+        logging.info(f"{len(chunks)} chunks codificados con {workers} procesos")
+
+        mux_chunks(archivos_chunk, total_frames / fps, archivos_audio, nombre_salida,
+                   pistas_audio=pistas_audio)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def _encode_chunk_atomico(slides, conteos, salida, *args):
+    # Un chunk a medias no debe parecer terminado si el proceso muere
+    temporal = salida[:-len(".mp4")] + ".tmp.mp4"
+    encode_video_chunk(slides, conteos, temporal, *args)
+    os.replace(temporal, salida)
+
+
+def mux_chunks(archivos_chunk, duracion, archivos_audio, nombre_salida, pistas_audio=None):
+    """Joins video-only chunks with stream copy and encodes the narration once on top."""
+    work_dir = tempfile.mkdtemp(prefix="mux_")
+    try:
+        lista_video = os.path.join(work_dir, "chunks.ffconcat")
+        write_concat_list(lista_video, archivos_chunk)
+        entradas, salida = _args_audio(work_dir, _pistas(archivos_audio, pistas_audio), 1)
+        args = ["-f", "concat", "-safe", "0", "-i", lista_video] + entradas + ["-map", "0:v"] + salida
+        args += [
+            "-c:v", "copy",
+            "-t", f"{duracion:.6f}",
+            "-movflags", "+faststart",
+            nombre_salida,
+        ]
+        run_ffmpeg(args)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def extraer_pista(entrada, pista, salida):
+    """Copies the video, audio track ``pista`` and any subtitles of ``entrada`` into ``salida``.
+
+    Nothing is re-encoded: it only rewrites the container.
+    """
+    run_ffmpeg(["-i", entrada, "-map", "0:v", "-map", f"0:a:{pista}", "-map", "0:s?",
+                "-c", "copy", "-movflags", "+faststart", salida])
+
+
+class HLSWriter:
+    """Writes a growing HLS playlist of MPEG-TS blocks and assembles the final MP4."""
+
+    def __init__(self, out_dir, fps=VIDEO_FPS, preset=VIDEO_PRESET, threads=VIDEO_THREADS):
+        self.out_dir = out_dir
+        self.fps = fps
+        self.preset = preset
+        self.threads = threads
+        self.segmentos = []
+        self.tiempo = 0.0
+        os.makedirs(out_dir, exist_ok=True)
+        self.playlist = os.path.join(out_dir, "index.m3u8")
+        self._escribir_playlist(final=False)
+
+    def add_block(self, slides, duraciones, archivos_audio):
+        """Encodes one block of slides with its narration and publishes it."""
+        conteos = frame_counts(duraciones, self.fps, inicio=self.tiempo)
+        frames = sum(conteos)
+        duracion = frames / self.fps
+        nombre = f"seg_{len(self.segmentos):05d}.ts"
+        salida = os.path.join(self.out_dir, nombre)
+
+        work_dir = tempfile.mkdtemp(prefix="hls_")
+        try:
+            lista_video = os.path.join(work_dir, "video.ffconcat")
+            validos = [i for i, n in enumerate(conteos) if n > 0]
+            write_concat_list(lista_video, [slides[i] for i in validos],
+                              [conteos[i] / self.fps for i in validos])
+            args = ["-f", "concat", "-safe", "0", "-i", lista_video]
+            if archivos_audio:
+                lista_audio = os.path.join(work_dir, "audio.ffconcat")
+                write_concat_list(lista_audio, archivos_audio)
+                args += ["-f", "concat", "-safe", "0", "-i", lista_audio]
+            else:
+                args += ["-f", "lavfi", "-i", f"anullsrc=r={HLS_SAMPLE_RATE}:cl=mono"]
+            args += [
+                "-map", "0:v", "-map", "1:a",
+                "-vf", f"format=yuv420p,fps={self.fps}",
+                "-frames:v", str(frames),
+                "-c:v", VIDEO_CODEC,
+                "-preset", self.preset,
+                "-tune", "stillimage",
+                "-threads", str(self.threads),
+                # Mismo formato de audio en todos los bloques para poder unirlos sin recodificar
+                "-af", "apad",
+                "-t", f"{duracion:.6f}",
+                "-c:a", AUDIO_CODEC,
+                "-ar", str(HLS_SAMPLE_RATE),
+                "-ac", "1",
+                "-output_ts_offset", f"{self.tiempo:.6f}",
+                "-f", "mpegts",
+                salida,
+            ]
+            run_ffmpeg(args)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+        self.segmentos.append((nombre, duracion))
+        self.tiempo += duracion
+        self._escribir_playlist(final=False)
+
+    def _escribir_playlist(self, final):
+        duracion_maxima = max([d for _, d in self.segmentos] or [1])
+        lineas = [
+            "#EXTM3U",
+            "#EXT-X-VERSION:3",
+            f"#EXT-X-TARGETDURATION:{int(duracion_maxima) + 1}",
+            "#EXT-X-MEDIA-SEQUENCE:0",
+            "#EXT-X-PLAYLIST-TYPE:EVENT",
+        ]
+        for nombre, duracion in self.segmentos:
+            lineas.append(f"#EXTINF:{duracion:.6f},")
+            lineas.append(nombre)
+        if final:
+            lineas.append("#EXT-X-ENDLIST")
+        temporal = self.playlist + ".tmp"
+        with open(temporal, "w", encoding="utf-8") as f:
+            f.write("\n".join(lineas) + "\n")
+        # Reemplazo atómico: el reproductor nunca ve una playlist a medias
+        os.replace(temporal, self.playlist)
+
+    def finalize(self, nombre_salida):
+        """Closes the playlist and joins all blocks into a standard MP4 without re-encoding."""
+        self._escribir_playlist(final=True)
+        # Los bloques ya llevan marcas de tiempo continuas: basta concatenar los bytes TS
+        entrada = "concat:" + "|".join(os.path.join(self.out_dir, n) for n, _ in self.segmentos)
+        run_ffmpeg([
+            "-i", entrada,
+            "-c", "copy",
+            "-bsf:a", "aac_adtstoasc",
+            "-movflags", "+faststart",
+            nombre_salida,
+        ])
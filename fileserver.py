@@ -0,0 +1,164 @@
+"""Small HTTP server that streams rendered videos from the output store.
+
+Serves /videos/<job_id>/<file> with Range support, so players can seek and
+downloads resume, reading from disk in fixed-size chunks: memory use does
+not depend on the file size. Add ?descargar=1 to get it as an attachment.
+
+Browsers fetch the videos from this server directly, so unless the app is
+only used from the machine it runs on, set VIDEO_BASE_URL to the address
+they can reach it at (e.g. https://videos.example.com or http://host:8502).
+
+Usage: python fileserver.py [--port 8502] [--dir outputs]
+"""
+import argparse
+import logging
+import mimetypes
+import os
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, unquote, urlsplit
+
+from store import OutputStore, OUTPUT_DIR
+
+# Constantes
+FILE_SERVER_HOST = "0.0.0.0"
+FILE_SERVER_PORT = int(os.environ.get("VIDEO_SERVER_PORT", 8502))
+FILE_CHUNK_BYTES = 256 * 1024
+HOSTS_LOCALES = ("localhost", "127.0.0.1", "::1")
+
+_RANGO = re.compile(r"bytes=(\d*)-(\d*)$")
+
+
+def rango_solicitado(cabecera, tamano):
+    """Parses a single-range Range header into (start, end), both inclusive.
+
+    Returns None without a header (or with one we do not support, which
+    means serving the whole file) and raises ValueError if the range is
+    not satisfiable.
+    """
+    if not cabecera:
+        return None
+    m = _RANGO.match(cabecera.strip())
+    if not m or m.groups() == ("", ""):
+        return None
+    inicio, fin = m.groups()
+    if inicio == "":
+        # bytes=-N: los últimos N bytes
+        inicio, fin = max(0, tamano - int(fin)), tamano - 1
+    else:
+        inicio, fin = int(inicio), min(int(fin) if fin else tamano - 1, tamano - 1)
+    if inicio >= tamano or inicio > fin:
+        raise ValueError(f"Rango no satisfacible: {cabecera}")
+    return inicio, fin
+
+
+def base_publica(host=None):
+    """Returns the base URL browsers use to reach the video server.
+
+    That is VIDEO_BASE_URL if set. Without it only a browser on this
+    machine can reach the server: ``host`` is the Host the app is being
+    used at, and anything other than localhost raises.
+    """
+    base = os.environ.get("VIDEO_BASE_URL")
+    if base:
+        return base.rstrip("/")
+    nombre = urlsplit(f"//{host}").hostname if host else "localhost"
+    if nombre not in HOSTS_LOCALES:
+        raise Exception(f"La app se usa desde {host}: define VIDEO_BASE_URL con la dirección pública "
+                        f"del servidor de videos (puerto {FILE_SERVER_PORT})")
+    return f"http://localhost:{FILE_SERVER_PORT}"
+
+
+def url_video(job_id, nombre, descargar=False, base=None):
+    """Returns the URL of a stored file under ``base`` (base_publica() by default)."""
+    base = base or base_publica()
+    return f"{base.rstrip('/')}/videos/{quote(job_id)}/{quote(nombre)}" + ("?descargar=1" if descargar else "")
+
+
+class VideoHandler(BaseHTTPRequestHandler):
+    store = None
+
+    def do_HEAD(self):
+        self._servir(cuerpo=False)
+
+    def do_GET(self):
+        self._servir(cuerpo=True)
+
+    def _servir(self, cuerpo):
+        partes = urlsplit(self.path)
+        trozos = unquote(partes.path).strip("/").split("/")
+        ruta = self.store.ruta(trozos[1], trozos[2]) if len(trozos) == 3 and trozos[0] == "videos" else None
+        if ruta is None:
+            self.send_error(404)
+            return
+
+        tamano = os.path.getsize(ruta)
+        try:
+            rango = rango_solicitado(self.headers.get("Range"), tamano)
+        except ValueError:
+            self.send_response(416)
+            self.send_header("Content-Range", f"bytes */{tamano}")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        inicio, fin = rango or (0, tamano - 1)
+
+        self.send_response(206 if rango else 200)
+        self.send_header("Content-Type", mimetypes.guess_type(ruta)[0] or "application/octet-stream")
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Length", str(fin - inicio + 1))
+        if rango:
+            self.send_header("Content-Range", f"bytes {inicio}-{fin}/{tamano}")
+        if "descargar" in parse_qs(partes.query):
+            self.send_header("Content-Disposition", f"attachment; filename*=UTF-8''{quote(trozos[2])}")
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.end_headers()
+        if not cuerpo or tamano == 0:
+            return
+
+        self.store.tocar(trozos[1])
+        try:
+            with open(ruta, "rb") as f:
+                f.seek(inicio)
+                restante = fin - inicio + 1
+                while restante > 0:
+                    datos = f.read(min(FILE_CHUNK_BYTES, restante))
+                    if not datos:
+                        break
+                    self.wfile.write(datos)
+                    restante -= len(datos)
+        except (BrokenPipeError, ConnectionResetError):
+            # El reproductor cancela peticiones al saltar a otra posición
+            pass
+
+    def log_message(self, formato, *args):
+        logging.debug(f"{self.address_string()} {formato % args}")
+
+
+def iniciar_servidor(store, host=FILE_SERVER_HOST, port=FILE_SERVER_PORT):
+    """Starts the server in a daemon thread and returns it."""
+    handler = type("StoreVideoHandler", (VideoHandler,), {"store": store})
+    servidor = ThreadingHTTPServer((host, port), handler)
+    servidor.daemon_threads = True
+    threading.Thread(target=servidor.serve_forever, name="video-server", daemon=True).start()
+    logging.info(f"Servidor de videos en http://{host}:{port}/videos/")
+    return servidor
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=FILE_SERVER_HOST)
+    parser.add_argument("--port", type=int, default=FILE_SERVER_PORT)
+    parser.add_argument("--dir", default=OUTPUT_DIR, help="directorio del almacén de videos")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    servidor = iniciar_servidor(OutputStore(args.dir), args.host, args.port)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        servidor.shutdown()
+
+
+if __name__ == "__main__":
+    main()
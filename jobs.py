@@ -0,0 +1,283 @@
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+from checkpoint import CHECKPOINT_DIRNAME, CHECKPOINT_MAX_AGE, checkpoint_abandonado
+from store import OutputStore, OUTPUT_DIR
+
+# Constantes
+JOBS_DIR = "jobs"
+JOB_WORKERS = 2
+PROGRESS_INTERVAL = 0.5  # segundos mínimos entre escrituras de progreso
+
+# Estados de un trabajo
+PENDIENTE = "pendiente"
+EN_CURSO = "en_curso"
+COMPLETADO = "completado"
+FALLIDO = "fallido"
+
+
+@contextmanager
+def _conectar(db_path):
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    try:
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+
+def _crear_tabla(db_path):
+    with _conectar(db_path) as conn:
+        # WAL permite leer el progreso mientras los workers escriben
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                estado TEXT NOT NULL,
+                params TEXT NOT NULL,
+                progreso TEXT NOT NULL DEFAULT '{}',
+                resultado TEXT,
+                error TEXT,
+                creado REAL NOT NULL,
+                actualizado REAL NOT NULL
+            )
+        """)
+        columnas = {fila["name"] for fila in conn.execute("PRAGMA table_info(jobs)")}
+        if "metricas" not in columnas:
+            # Bases de datos creadas antes de guardar las métricas del render
+            conn.execute("ALTER TABLE jobs ADD COLUMN metricas TEXT")
+
+
+def _actualizar(db_path, job_id, **campos):
+    campos["actualizado"] = time.time()
+    columnas = ", ".join(f"{c} = ?" for c in campos)
+    with _conectar(db_path) as conn:
+        conn.execute(f"UPDATE jobs SET {columnas} WHERE id = ?", list(campos.values()) + [job_id])
+
+
+def _iniciar_worker():
+    """Worker initializer: loads the render pipeline and warms its shared resources.
+
+    Workers live as long as the queue, so back-to-back jobs reuse the TTS
+    channel, fonts and end-card instead of setting them up per job.
+    """
+    from video import LOGO_URL
+    from resources import get_registry
+
+    logging.basicConfig(level=logging.INFO)
+    get_registry().precalentar(logo_url=LOGO_URL)
+
+
+def _ejecutar_job(job_id, db_path, jobs_dir, output_dir=OUTPUT_DIR, workers=1):
+    """Worker entry point: renders one job inside its own working directory.
+
+    The video is written to <output_dir>/<job_id>/, the job's slot in the
+    output store. Each worker process has its own TTS rate limiter, so a
+    job gets 1/``workers`` of the quota unless its params set one.
+    """
+    # Importamos aquí para que el proceso padre no cargue el pipeline de render
+    from video import create_simple_video, PREVIEW_DIR
+    from metrics import RenderMetrics, exportar_prometheus
+    from tts import TTS_REQUESTS_PER_MINUTE
+
+    logging.basicConfig(level=logging.INFO)
+    work_dir = os.path.join(jobs_dir, job_id)
+    with _conectar(db_path) as conn:
+        params = json.loads(conn.execute("SELECT params FROM jobs WHERE id = ?", (job_id,)).fetchone()[0])
+    params.setdefault("requests_per_minute", TTS_REQUESTS_PER_MINUTE / workers)
+    _actualizar(db_path, job_id, estado=EN_CURSO, error=None)
+
+    progreso = {}
+    ultimo = [0.0]
+
+    def progress(etapa, actual, total):
+        progreso[etapa] = [actual, total]
+        ahora = time.time()
+        if ahora - ultimo[0] >= PROGRESS_INTERVAL or actual == total:
+            ultimo[0] = ahora
+            _actualizar(db_path, job_id, progreso=json.dumps(progreso))
+
+    # El nombre lo elige el usuario: nunca fuera del directorio del trabajo
+    nombre_salida = os.path.join(OutputStore(output_dir).job_dir(job_id),
+                                 os.path.basename(params.pop("nombre_salida")))
+    metricas = RenderMetrics()
+    preview_dir = os.path.join(PREVIEW_DIR, job_id)
+    try:
+        success, message = create_simple_video(nombre_salida=nombre_salida, work_dir=work_dir,
+                                               progress=progress, preview_dir=preview_dir,
+                                               checkpoint_dir=os.path.join(work_dir, CHECKPOINT_DIRNAME),
+                                               metricas=metricas, **params)
+    except Exception as e:
+        success, message = False, str(e)
+    finally:
+        # La vista previa HLS solo se muestra mientras el trabajo está en curso;
+        # terminado, el video queda en el almacén de salida
+        shutil.rmtree(preview_dir, ignore_errors=True)
+
+    try:
+        exportar_prometheus(metricas, params.get("backend", "moviepy"), success)
+    except Exception as e:
+        logging.warning(f"No se pudieron exportar las métricas: {str(e)}")
+
+    if success:
+        _actualizar(db_path, job_id, estado=COMPLETADO, resultado=nombre_salida,
+                    progreso=json.dumps(progreso), metricas=json.dumps(metricas.resumen()))
+    else:
+        _actualizar(db_path, job_id, estado=FALLIDO, error=message,
+                    progreso=json.dumps(progreso), metricas=json.dumps(metricas.resumen()))
+    return success
+
+
+class JobQueue:
+    """Persistent render queue executed by a pool of worker processes."""
+
+    def __init__(self, workers=JOB_WORKERS, jobs_dir=JOBS_DIR, db_path=None, store=None):
+        self.jobs_dir = jobs_dir
+        self.workers = workers
+        self.db_path = db_path or os.path.join(jobs_dir, "jobs.db")
+        self.store = store or OutputStore()
+        os.makedirs(jobs_dir, exist_ok=True)
+        _crear_tabla(self.db_path)
+        # spawn: los workers no heredan hilos ni canales gRPC del proceso de Streamlit
+        self.pool = ProcessPoolExecutor(max_workers=workers,
+                                        mp_context=multiprocessing.get_context("spawn"),
+                                        initializer=_iniciar_worker)
+        self.lock = threading.Lock()
+        self.limpiar_checkpoints()
+        self.limpiar_videos()
+        self._reanudar_pendientes()
+
+    def _reanudar_pendientes(self):
+        """Re-queues jobs left pending or running by a previous process."""
+        with _conectar(self.db_path) as conn:
+            filas = conn.execute("SELECT id FROM jobs WHERE estado IN (?, ?) ORDER BY creado",
+                                 (PENDIENTE, EN_CURSO)).fetchall()
+        for fila in filas:
+            logging.info(f"Reanudando trabajo {fila['id']}")
+            _actualizar(self.db_path, fila["id"], estado=PENDIENTE)
+            self._encolar(fila["id"])
+
+    def _encolar(self, job_id):
+        with self.lock:
+            self.pool.submit(_ejecutar_job, job_id, self.db_path, self.jobs_dir,
+                             self.store.directorio, self.workers)
+
+    def work_dir(self, job_id):
+        return os.path.join(self.jobs_dir, job_id)
+
+    def checkpoint_dir(self, job_id):
+        return os.path.join(self.work_dir(job_id), CHECKPOINT_DIRNAME)
+
+    def reanudar(self, job_id):
+        """Re-queues a failed job; it continues from its checkpoint if one is left."""
+        job = self.get(job_id)
+        if job is None or job["estado"] != FALLIDO:
+            raise Exception(f"Solo se pueden reanudar trabajos fallidos: {job_id}")
+        if not os.path.isdir(self.work_dir(job_id)):
+            raise Exception(f"Los archivos del trabajo se eliminaron por la política de retención: {job_id}")
+        _actualizar(self.db_path, job_id, estado=PENDIENTE, error=None)
+        self._encolar(job_id)
+
+    def promover(self, job_id):
+        """Queues the final render of a finished draft and returns the new job id.
+
+        The final render uses the draft's settings over the whole text; its
+        audio comes from the cache the draft filled. A draft with extra voices
+        is finished with DRAFT_BACKEND if its backend cannot mux them.
+        """
+        from video import DRAFT_BACKEND, VOICE_TRACK_BACKENDS
+
+        job = self.get(job_id)
+        if job is None or job["estado"] != COMPLETADO or not job["params"].get("borrador"):
+            raise Exception(f"Solo se pueden promover borradores terminados: {job_id}")
+        if not os.path.isdir(self.work_dir(job_id)):
+            raise Exception(f"Los archivos del trabajo se eliminaron por la política de retención: {job_id}")
+        imagen = job["params"].get("background_image")
+        params = dict(job["params"], borrador=False, rango_segmentos=None, voz_economica=False,
+                      background_image=None)
+        if params.get("voces_adicionales") and params.get("backend", "moviepy") not in VOICE_TRACK_BACKENDS:
+            params.update(backend=DRAFT_BACKEND, karaoke=False, movimiento_fondo=False)
+        archivos = {"background_image": imagen} if imagen and os.path.exists(imagen) else None
+        return self.submit(params, archivos=archivos)
+
+    def limpiar_checkpoints(self, max_age=CHECKPOINT_MAX_AGE):
+        """Deletes the checkpoints of failed jobs not resumed within ``max_age`` seconds."""
+        with _conectar(self.db_path) as conn:
+            ids = [f["id"] for f in conn.execute("SELECT id FROM jobs WHERE estado = ?", (FALLIDO,))]
+        borrados = 0
+        for job_id in ids:
+            directorio = self.checkpoint_dir(job_id)
+            if os.path.isdir(directorio) and checkpoint_abandonado(directorio, max_age):
+                shutil.rmtree(directorio, ignore_errors=True)
+                borrados += 1
+        if borrados:
+            logging.info(f"{borrados} checkpoints abandonados eliminados")
+        return borrados
+
+    def limpiar_videos(self):
+        """Applies the output store's retention policy, sparing jobs still rendering.
+
+        The working directory (input copies, checkpoint) of every job whose
+        outputs are deleted goes with them: the job can no longer be
+        resumed or promoted.
+        """
+        with _conectar(self.db_path) as conn:
+            activos = {f["id"] for f in conn.execute("SELECT id FROM jobs WHERE estado IN (?, ?)",
+                                                     (PENDIENTE, EN_CURSO))}
+        borrados = self.store.limpiar(excluir=activos)
+        for job_id in borrados:
+            shutil.rmtree(self.work_dir(job_id), ignore_errors=True)
+        return borrados
+
+    def submit(self, params, archivos=None):
+        """Queues a render and returns its job id.
+
+        ``params`` are keyword arguments for create_simple_video (without
+        work_dir/progress). ``archivos`` maps a parameter name to a local
+        file that is copied into the job directory, e.g. the background image.
+        """
+        self.limpiar_videos()
+        job_id = uuid.uuid4().hex[:12]
+        work_dir = self.work_dir(job_id)
+        os.makedirs(work_dir)
+        params = dict(params)
+        for nombre, ruta in (archivos or {}).items():
+            destino = os.path.join(work_dir, "input_" + os.path.basename(ruta))
+            shutil.copyfile(ruta, destino)
+            params[nombre] = destino
+
+        ahora = time.time()
+        with _conectar(self.db_path) as conn:
+            conn.execute("INSERT INTO jobs (id, estado, params, creado, actualizado) VALUES (?, ?, ?, ?, ?)",
+                         (job_id, PENDIENTE, json.dumps(params), ahora, ahora))
+        self._encolar(job_id)
+        return job_id
+
+    def get(self, job_id):
+        """Returns the job as a dict, or None if it does not exist."""
+        with _conectar(self.db_path) as conn:
+            fila = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if fila is None:
+            return None
+        job = dict(fila)
+        job["params"] = json.loads(job["params"])
+        job["progreso"] = json.loads(job["progreso"])
+        job["metricas"] = json.loads(job["metricas"]) if job["metricas"] else None
+        return job
+
+    def list(self, limit=50):
+        """Returns the most recent jobs, newest first."""
+        with _conectar(self.db_path) as conn:
+            ids = [f["id"] for f in conn.execute("SELECT id FROM jobs ORDER BY creado DESC LIMIT ?",
+                                                 (limit,))]
+        return [self.get(job_id) for job_id in ids]
@@ -0,0 +1,49 @@
+import bisect
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+# Constantes
+KARAOKE_COLOR = "#ffd700"
+
+
+class KaraokeSlide:
+    """Frames of one slide with the word being spoken highlighted.
+
+    The slide is rendered once. On each highlight change the previous
+    word's box is restored from that base frame and only the current word
+    is redrawn, so the cost depends on the word size and not on the frame
+    size. The returned frame is reused between calls.
+    """
+
+    def __init__(self, base, cajas, font, inicios, color=KARAOKE_COLOR):
+        self.base = base
+        self.cajas = cajas
+        self.font = font
+        self.inicios = inicios[:len(cajas)]
+        self.color = color
+        self.redibujados = 0
+        self._frame = base.copy()
+        self._actual = -1
+
+    def _restaurar(self, j):
+        x0, y0, x1, y1 = self.cajas[j][2]
+        self._frame[y0:y1, x0:x1] = self.base[y0:y1, x0:x1]
+
+    def _resaltar(self, j):
+        (x, y), palabra, (x0, y0, x1, y1) = self.cajas[j]
+        parche = Image.fromarray(self.base[y0:y1, x0:x1])
+        ImageDraw.Draw(parche).text((x - x0, y - y0), palabra, font=self.font, fill=self.color)
+        self._frame[y0:y1, x0:x1] = np.asarray(parche)
+
+    def frame(self, t):
+        """Returns the frame ``t`` seconds after the start of the slide."""
+        j = bisect.bisect_right(self.inicios, t) - 1
+        if j != self._actual:
+            if self._actual >= 0:
+                self._restaurar(self._actual)
+            if j >= 0:
+                self._resaltar(j)
+            self._actual = j
+            self.redibujados += 1
+        return self._frame
@@ -0,0 +1,99 @@
+import math
+
+import numpy as np
+from PIL import Image, ImageColor
+
+# Constantes
+KENBURNS_ZOOM = 1.2  # zoom máximo sobre el fondo
+KENBURNS_RESAMPLE = Image.BOX  # promedio por área: exacto para reducciones de hasta 2x y el más rápido
+# Recorridos que se alternan entre diapositivas: (zoom inicial, zoom final, centro inicial, centro final)
+# con el centro en fracciones del margen libre (0: borde izquierdo/superior, 1: derecho/inferior)
+KENBURNS_MOVIMIENTOS = (
+    (1.0, KENBURNS_ZOOM, (0.5, 0.5), (0.5, 0.5)),
+    (KENBURNS_ZOOM, KENBURNS_ZOOM, (0.0, 0.5), (1.0, 0.5)),
+    (KENBURNS_ZOOM, 1.0, (0.5, 0.5), (0.5, 0.5)),
+    (KENBURNS_ZOOM, KENBURNS_ZOOM, (1.0, 0.5), (0.0, 0.5)),
+)
+
+
+def tamano_base(size, zoom=KENBURNS_ZOOM):
+    """Size the background must have so the maximum zoom is still 1:1 with the output."""
+    return int(math.ceil(size[0] * zoom)), int(math.ceil(size[1] * zoom))
+
+
+class Piramide:
+    """Background at full resolution plus copies halved down to ``min_size``.
+
+    Built once per video. A frame is resampled from the smallest level
+    that still has the output resolution, so the resample ratio stays
+    below 2 whatever the zoom or the output size; at 1:1 (a pan at
+    maximum zoom) it is just a slice of the level.
+    """
+
+    def __init__(self, base, min_size):
+        self.niveles = [base]
+        while self.niveles[-1].width // 2 >= min_size[0] and self.niveles[-1].height // 2 >= min_size[1]:
+            self.niveles.append(self.niveles[-1].reduce(2))
+        self.matrices = [np.asarray(nivel) for nivel in self.niveles]
+
+    @property
+    def size(self):
+        return self.niveles[0].size
+
+    def encuadre(self, caja, size):
+        """Returns the area ``caja`` (x0, y0, x1, y1, in full-resolution pixels) at ``size``
+        as a new writable array."""
+        ratio = (caja[2] - caja[0]) / size[0]
+        k = min(len(self.niveles) - 1, int(math.floor(math.log2(ratio)))) if ratio >= 2 else 0
+        x0, y0, x1, y1 = (c / 2 ** k for c in caja)
+        if abs(x1 - x0 - size[0]) < 0.5 and abs(y1 - y0 - size[1]) < 0.5:
+            x, y = int(round(x0)), int(round(y0))
+            return self.matrices[k][y:y + size[1], x:x + size[0]].copy()
+        return np.array(self.niveles[k].resize(size, KENBURNS_RESAMPLE, box=(x0, y0, x1, y1)))
+
+
+class KenBurnsSlide:
+    """Frames of one slide whose background pans and zooms under a fixed text.
+
+    The text is rendered once as an alpha mask; only its non-transparent
+    pixels are blended over each frame, with their weights and the
+    premultiplied text color cached. A frame costs one slice or resample
+    of the background plus that blend.
+    """
+
+    def __init__(self, piramide, size, mascara, duracion, text_color, movimiento=0):
+        self.piramide = piramide
+        self.size = size
+        self.duracion = max(duracion, 1e-6)
+        self.movimiento = KENBURNS_MOVIMIENTOS[movimiento % len(KENBURNS_MOVIMIENTOS)]
+        caja, mascara = mascara
+        self.pixeles = None
+        if mascara is not None:
+            alfa = np.asarray(mascara)
+            ys, xs = np.nonzero(alfa)
+            self.pixeles = (ys + caja[1], xs + caja[0])
+            self.alfa = alfa[ys, xs].astype(np.uint16)[:, None]
+            self.color = np.array(ImageColor.getrgb(text_color)[:3], dtype=np.uint16) * self.alfa
+            self.resto = 255 - self.alfa
+
+    def _caja(self, p):
+        zoom_inicio, zoom_fin, centro_inicio, centro_fin = self.movimiento
+        zoom = zoom_inicio + (zoom_fin - zoom_inicio) * p
+        ancho_base, alto_base = self.piramide.size
+        # Zoom 1 muestra el fondo entero; con KENBURNS_ZOOM la ventana mide lo mismo que la salida
+        ancho, alto = ancho_base / zoom, alto_base / zoom
+        fx = centro_inicio[0] + (centro_fin[0] - centro_inicio[0]) * p
+        fy = centro_inicio[1] + (centro_fin[1] - centro_inicio[1]) * p
+        x0 = (ancho_base - ancho) * fx
+        y0 = (alto_base - alto) * fy
+        return x0, y0, x0 + ancho, y0 + alto
+
+    def frame(self, t):
+        """Returns the frame ``t`` seconds after the start of the slide."""
+        p = min(1.0, max(0.0, t / self.duracion))
+        p = p * p * (3 - 2 * p)  # arranque y parada suaves
+        frame = self.piramide.encuadre(self._caja(p), self.size)
+        if self.pixeles is not None:
+            fondo = frame[self.pixeles].astype(np.uint16)
+            frame[self.pixeles] = ((fondo * self.resto + self.color + 127) // 255).astype(np.uint8)
+        return frame
@@ -1,307 +1,181 @@
 import streamlit as st
+import streamlit.components.v1 as components
 import os
 import json
 import logging
-import time
-from google.cloud import texttospeech
-from moviepy.editor import AudioFileClip, ImageClip, concatenate_videoclips
-from PIL import Image, ImageDraw, ImageFont
-import numpy as np
 import tempfile
-import requests
-from io import BytesIO
+from video import (VOCES_DISPONIBLES, RENDER_BACKENDS, DEFAULT_FONT_SIZE, PREVIEW_DIR, LOGO_URL,
+                   OUTPUT_PROFILES, DRAFT_SIZE, DRAFT_FPS, DRAFT_BACKEND, VOICE_TRACK_BACKENDS,
+                   ruta_perfil, ruta_voz, resolver_voces, segmentar_texto)
+from encoder import ENCODE_WORKERS
+from jobs import JobQueue, JOB_WORKERS, PENDIENTE, EN_CURSO, COMPLETADO, FALLIDO
+from fileserver import iniciar_servidor, url_video, base_publica
 st.set_page_config(
     page_title="video-creator",
     layout="wide"
 )
 logging.basicConfig(level=logging.INFO)
 
-# Cargar credenciales de GCP desde secrets
-credentials = dict(st.secrets.gcp_service_account)
-with open("google_credentials.json", "w") as f:
-    json.dump(credentials, f)
+# Cargar credenciales de GCP desde secrets, salvo que el entorno ya las defina.
+# Streamlit vuelve a ejecutar este script en cada interacción: solo escribimos
+# el archivo la primera vez.
+if "GOOGLE_APPLICATION_CREDENTIALS" not in os.environ:
+    credentials = dict(st.secrets.gcp_service_account)
+    with open("google_credentials.json", "w") as f:
+        json.dump(credentials, f)
+    os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = "google_credentials.json"
 
-os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = "google_credentials.json"
-
-# Constantes
-TEMP_DIR = "temp"
-FONT_PATH = "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"  # Ajusta la ruta si es necesario
-DEFAULT_FONT_SIZE = 30
-#LINE_HEIGHT = 40 # Eliminamos LINE_HEIGHT como variable global
-VIDEO_FPS = 24
-VIDEO_CODEC = 'libx264'
-AUDIO_CODEC = 'aac'
-VIDEO_PRESET = 'ultrafast'
-VIDEO_THREADS = 4
-IMAGE_SIZE_TEXT = (1280, 360)
-IMAGE_SIZE_SUBSCRIPTION = (1280, 720)
-SUBSCRIPTION_DURATION = 5
-LOGO_SIZE = (100, 100)
-VIDEO_SIZE = (1280, 720)  # Tamaño estándar del video
-
-# Configuración de voces
-VOCES_DISPONIBLES = {
-    'es-ES-Standard-B': texttospeech.SsmlVoiceGender.MALE,
-    'es-ES-Standard-A': texttospeech.SsmlVoiceGender.FEMALE,
-    'es-ES-Standard-C': texttospeech.SsmlVoiceGender.FEMALE,
-    'es-ES-Standard-D': texttospeech.SsmlVoiceGender.FEMALE,
-    'es-ES-Standard-E': texttospeech.SsmlVoiceGender.FEMALE,
-    'es-ES-Standard-F': texttospeech.SsmlVoiceGender.MALE,
-    'es-ES-Neural2-A': texttospeech.SsmlVoiceGender.FEMALE,
-    'es-ES-Neural2-B': texttospeech.SsmlVoiceGender.MALE,
-    'es-ES-Neural2-C': texttospeech.SsmlVoiceGender.FEMALE,
-    'es-ES-Neural2-D': texttospeech.SsmlVoiceGender.FEMALE,
-    'es-ES-Neural2-E': texttospeech.SsmlVoiceGender.FEMALE,
-    'es-ES-Neural2-F': texttospeech.SsmlVoiceGender.MALE,
-    'es-ES-Polyglot-1': texttospeech.SsmlVoiceGender.MALE,
-    'es-ES-Studio-C': texttospeech.SsmlVoiceGender.FEMALE,
-    'es-ES-Studio-F': texttospeech.SsmlVoiceGender.MALE,
-    'es-ES-Wavenet-B': texttospeech.SsmlVoiceGender.MALE,
-    'es-ES-Wavenet-C': texttospeech.SsmlVoiceGender.FEMALE,
-    'es-ES-Wavenet-D': texttospeech.SsmlVoiceGender.FEMALE,
-    'es-ES-Wavenet-E': texttospeech.SsmlVoiceGender.MALE,
-    'es-ES-Wavenet-F': texttospeech.SsmlVoiceGender.FEMALE,
+POLL_INTERVAL = 2
+ETAPAS = {
+    'sintesis': "Segmentos sintetizados",
+    'diapositivas': "Diapositivas renderizadas",
+    'codificacion': "Codificación (%)",
 }
 
-def create_text_image(text, size=IMAGE_SIZE_TEXT, font_size=DEFAULT_FONT_SIZE,
-                      bg_color="black", text_color="white", background_image=None,
-                      stretch_background=False, full_size_background=False):
-    """Creates a text image with the specified text and styles."""
-    if full_size_background:
-      size = VIDEO_SIZE
 
-    if background_image:
-        try:
-            img = Image.open(background_image).convert("RGB")
-            if stretch_background:
-                img = img.resize(size)
-            else:
-              img.thumbnail(size)
-              new_img = Image.new('RGB', size, bg_color)
-              new_img.paste(img, ((size[0]-img.width)//2, (size[1]-img.height)//2))
-              img = new_img
-        except Exception as e:
-            logging.error(f"Error al cargar imagen de fondo: {str(e)}, usando fondo {bg_color}.")
-            img = Image.new('RGB', size, bg_color)
-    else:
-        img = Image.new('RGB', size, bg_color)
+@st.cache_resource
+def get_job_queue():
+    """Shares one job queue (and its worker processes) across all sessions."""
+    return JobQueue(workers=JOB_WORKERS)
 
-    draw = ImageDraw.Draw(img)
-    try:
-        font = ImageFont.truetype(FONT_PATH, font_size)
-    except Exception as e:
-        logging.error(f"Error al cargar la fuente, usando la fuente predeterminada: {str(e)}")
-        font = ImageFont.load_default()
-    
-    # Calculamos la altura de línea en función del tamaño de la fuente.
-    line_height = font_size * 1.5  # Aumentamos el factor a 1.5
 
-    words = text.split()
-    lines = []
-    current_line = []
+@st.cache_resource
+def get_video_server():
+    """Starts the range-capable video server once per process, next to the job queue."""
+    try:
+        return iniciar_servidor(get_job_queue().store)
+    except OSError as e:
+        # Otro proceso de la app ya sirve el mismo almacén en ese puerto
+        logging.warning(f"No se pudo iniciar el servidor de videos: {str(e)}")
+        return None
 
-    for word in words:
-        current_line.append(word)
-        test_line = ' '.join(current_line)
-        left, top, right, bottom = draw.textbbox((0, 0), test_line, font=font)
-        if right > size[0] - 60:
-            current_line.pop()
-            lines.append(' '.join(current_line))
-            current_line = [word]
-    lines.append(' '.join(current_line))
 
-    total_height = len(lines) * line_height
-    y = (size[1] - total_height) // 2
+HLS_PLAYER = """
+<video id="preview" controls style="width:100%"></video>
+<script src="https://cdn.jsdelivr.net/npm/hls.js@1"></script>
+<script>
+  var video = document.getElementById('preview');
+  var src = '{url}';
+  if (video.canPlayType('application/vnd.apple.mpegurl')) {{
+    video.src = src;
+  }} else if (Hls.isSupported()) {{
+    var hls = new Hls();
+    hls.loadSource(src);
+    hls.attachMedia(video);
+  }}
+</script>
+"""
 
-    for line in lines:
-        left, top, right, bottom = draw.textbbox((0, 0), line, font=font)
-        x = (size[0] - (right - left)) // 2
-        draw.text((x, y), line, font=font, fill=text_color)
-        y += line_height
-    return np.array(img)
 
+def _barras_progreso(job):
+    for etapa, nombre in ETAPAS.items():
+        actual, total = job["progreso"].get(etapa, [0, 0])
+        st.progress(actual / total if total else 0.0, text=f"{nombre}: {actual}/{total}")
 
-def create_subscription_image(logo_url, size=IMAGE_SIZE_SUBSCRIPTION, font_size=60):
-    """Creates an image for the subscription message."""
-    img = Image.new('RGB', size, (255, 0, 0))
-    draw = ImageDraw.Draw(img)
-    try:
-        font = ImageFont.truetype(FONT_PATH, font_size)
-        font2 = ImageFont.truetype(FONT_PATH, font_size//2)
-    except:
-        font = ImageFont.load_default()
-        font2 = ImageFont.load_default()
 
-    try:
-        response = requests.get(logo_url)
-        response.raise_for_status()
-        logo_img = Image.open(BytesIO(response.content)).convert("RGBA")
-        logo_img = logo_img.resize(LOGO_SIZE)
-        logo_position = (20, 20)
-        img.paste(logo_img, logo_position, logo_img)
-    except Exception as e:
-        logging.error(f"Error al cargar el logo: {str(e)}")
+def _desglose(metricas):
+    """Shows where the render time and resources went."""
+    etapas = metricas["etapas_s"]
+    columnas = st.columns(len(etapas) or 1)
+    for columna, (etapa, segundos) in zip(columnas, etapas.items()):
+        columna.metric(etapa.capitalize(), f"{segundos:.1f} s")
+    tts = metricas["tts"]
+    diapositivas = metricas["diapositivas"]
+    st.caption(
+        f"TTS: {tts['peticiones']} peticiones, latencia media {tts['latencia_media_s']} s, "
+        f"p95 {tts['latencia_p95_s']} s, {tts['reintentos']} reintentos · "
+        f"Diapositivas: {diapositivas.get('renders', 0)} a {diapositivas.get('render_ms_avg', 0)} ms · "
+        f"Codificación: {metricas['codificacion_fps']} fps · "
+        f"Disco temporal: {metricas['disco_temporal_bytes'] / 2**20:.1f} MB"
+        + (f" · Memoria pico: {metricas['memoria_pico_bytes'] / 2**20:.0f} MB, "
+           f"ffmpeg {metricas['memoria_hijos_pico_bytes'] / 2**20:.0f} MB"
+           if metricas.get("memoria_hijos_pico_bytes") is not None else "")
+    )
 
-    text1 = "¡SUSCRÍBETE A LECTOR DE SOMBRAS!"
-    left1, top1, right1, bottom1 = draw.textbbox((0, 0), text1, font=font)
-    x1 = (size[0] - (right1 - left1)) // 2
-    y1 = (size[1] - (bottom1 - top1)) // 2 - (bottom1 - top1) // 2 - 20
-    draw.text((x1, y1), text1, font=font, fill="white")
 
-    text2 = "Dale like y activa la campana 🔔"
-    left2, top2, right2, bottom2 = draw.textbbox((0, 0), text2, font=font2)
-    x2 = (size[0] - (right2 - left2)) // 2
-    y2 = (size[1] - (bottom2 - top2)) // 2 + (bottom1 - top1) // 2 + 20
-    draw.text((x2, y2), text2, font=font2, fill="white")
-    return np.array(img)
-    
-def create_simple_video(texto, nombre_salida, voz, logo_url, font_size, bg_color, text_color,
-                 background_image, stretch_background):
-    archivos_temp = []
-    clips_audio = []
-    clips_finales = []
-    
-    try:
-        logging.info("Iniciando proceso de creación de video...")
-        frases = [f.strip() + "." for f in texto.split('.') if f.strip()]
-        client = texttospeech.TextToSpeechClient()
-        
-        tiempo_acumulado = 0
-        
-        # Agrupamos frases en segmentos
-        segmentos_texto = []
-        segmento_actual = ""
-        for frase in frases:
-          if len(segmento_actual) + len(frase) < 300:
-            segmento_actual += " " + frase
-          else:
-            segmentos_texto.append(segmento_actual.strip())
-            segmento_actual = frase
-        segmentos_texto.append(segmento_actual.strip())
-        
-        for i, segmento in enumerate(segmentos_texto):
-            logging.info(f"Procesando segmento {i+1} de {len(segmentos_texto)}")
-            
-            synthesis_input = texttospeech.SynthesisInput(text=segmento)
-            voice = texttospeech.VoiceSelectionParams(
-                language_code="es-ES",
-                name=voz,
-                ssml_gender=VOCES_DISPONIBLES[voz]
-            )
-            audio_config = texttospeech.AudioConfig(
-                audio_encoding=texttospeech.AudioEncoding.MP3
-            )
-            
-            retry_count = 0
-            max_retries = 3
-            
-            while retry_count <= max_retries:
-              try:
-                response = client.synthesize_speech(
-                    input=synthesis_input,
-                    voice=voice,
-                    audio_config=audio_config
-                )
-                break
-              except Exception as e:
-                  logging.error(f"Error al solicitar audio (intento {retry_count + 1}): {str(e)}")
-                  if "429" in str(e):
-                    retry_count +=1
-                    time.sleep(2**retry_count)
-                  else:
-                    raise
-            
-            if retry_count > max_retries:
-                raise Exception("Maximos intentos de reintento alcanzado")
-            
-            temp_filename = f"temp_audio_{i}.mp3"
-            archivos_temp.append(temp_filename)
-            with open(temp_filename, "wb") as out:
-                out.write(response.audio_content)
-            
-            audio_clip = AudioFileClip(temp_filename)
-            clips_audio.append(audio_clip)
-            duracion = audio_clip.duration
-            
-            text_img = create_text_image(segmento, font_size=font_size,
-                                    bg_color=bg_color, text_color=text_color,
-                                    background_image=background_image,
-                                    stretch_background=stretch_background,
-                                    full_size_background=True)
-            txt_clip = (ImageClip(text_img)
-                      .set_start(tiempo_acumulado)
-                      .set_duration(duracion)
-                      .set_position('center'))
-            
-            video_segment = txt_clip.set_audio(audio_clip.set_start(tiempo_acumulado))
-            clips_finales.append(video_segment)
-            
-            tiempo_acumulado += duracion
-            time.sleep(0.2)
+@st.fragment(run_every=POLL_INTERVAL)
+def _progreso_en_vivo(cola, job_id, estado):
+    """Polls an active job without re-rendering the rest of the page."""
+    job = cola.get(job_id)
+    _barras_progreso(job)
+    if job["estado"] != estado:
+        # Al terminar redibujamos la página entera para mostrar el resultado
+        st.rerun()
 
-        # Añadir clip de suscripción
-        subscribe_img = create_subscription_image(logo_url) # Usamos la función creada
-        duracion_subscribe = 5
 
-        subscribe_clip = (ImageClip(subscribe_img)
-                        .set_start(tiempo_acumulado)
-                        .set_duration(duracion_subscribe)
-                        .set_position('center'))
+def mostrar_trabajos(cola):
+    """Shows this session's recent render jobs with per-stage progress and their results.
 
-        clips_finales.append(subscribe_clip)
-        
-        video_final = concatenate_videoclips(clips_finales, method="compose")
-        
-        video_final.write_videofile(
-            nombre_salida,
-            fps=24,
-            codec='libx264',
-            audio_codec='aac',
-            preset='ultrafast',
-            threads=4
-        )
-        
-        video_final.close()
-        
-        for clip in clips_audio:
-            clip.close()
-        
-        for clip in clips_finales:
-            clip.close()
-            
-        for temp_file in archivos_temp:
-            try:
-                if os.path.exists(temp_file):
-                    os.close(os.open(temp_file, os.O_RDONLY))
-                    os.remove(temp_file)
-            except:
-                pass
-        
-        return True, "Video generado exitosamente"
-        
+    The queue is shared by every visitor: only the jobs submitted from this
+    session (st.session_state.trabajos) are listed.
+    """
+    trabajos = [job for job in map(cola.get, reversed(st.session_state.trabajos[-20:])) if job]
+    if not trabajos:
+        return
+    st.header("Trabajos")
+    try:
+        # El navegador pide los videos al servidor de videos, no a Streamlit
+        base_videos = base_publica(st.context.headers.get("Host"))
     except Exception as e:
-        logging.error(f"Error: {str(e)}")
-        for clip in clips_audio:
-            try:
-                clip.close()
-            except:
-                pass
-                
-        for clip in clips_finales:
-            try:
-                clip.close()
-            except:
-                pass
-                
-        for temp_file in archivos_temp:
-            try:
-                if os.path.exists(temp_file):
-                    os.close(os.open(temp_file, os.O_RDONLY))
-                    os.remove(temp_file)
-            except:
-                pass
-        
-        return False, str(e)
+        base_videos = None
+        st.error(str(e))
+    for job in trabajos:
+        titulo = f"{job['params'].get('nombre_salida', job['id'])} — {job['estado']}"
+        if job["params"].get("borrador"):
+            titulo += " (borrador)"
+        activo = job["estado"] in (EN_CURSO, PENDIENTE)
+        with st.expander(titulo, expanded=activo):
+            playlist = os.path.join(PREVIEW_DIR, job["id"], "index.m3u8")
+            if activo and os.path.exists(playlist):
+                # Vista previa HLS servida como archivo estático de Streamlit
+                components.html(HLS_PLAYER.format(url=f"/app/{playlist}"), height=400)
+            if activo:
+                _progreso_en_vivo(cola, job["id"], job["estado"])
+            else:
+                _barras_progreso(job)
+                if job["metricas"]:
+                    _desglose(job["metricas"])
+            if job["estado"] == COMPLETADO:
+                perfiles = job["params"].get("perfiles")
+                rutas = ([ruta_perfil(job["resultado"], p) for p in perfiles] if perfiles
+                         else [job["resultado"]])
+                if job["params"].get("voces_adicionales"):
+                    # El navegador solo reproduce la primera pista: mostramos la copia de cada voz
+                    voces = resolver_voces(job["params"]["voz"], job["params"]["voces_adicionales"],
+                                           economica=job["params"].get("borrador") and
+                                           job["params"].get("voz_economica"))
+                    rutas = [ruta_voz(r, v) for r in rutas for v in voces] + rutas
+                rutas = [r for r in rutas if os.path.exists(r)]
+                if not rutas:
+                    st.info("El video se ha eliminado por la política de retención")
+                for ruta in (rutas if base_videos else []):
+                    # Subtítulos generados por el motor 'subtitulos', junto al video
+                    base = os.path.splitext(ruta)[0]
+                    subtitulos = [base + ext for ext in (".srt", ".vtt") if os.path.exists(base + ext)]
+                    # El reproductor y las descargas piden el archivo por rangos al servidor de
+                    # videos: Streamlit no lo carga en memoria
+                    st.video(url_video(job["id"], os.path.basename(ruta), base=base_videos),
+                             subtitles={"Español": base + ".vtt"} if subtitulos else None)
+                    columnas = st.columns(len(subtitulos) + 1)
+                    for columna, archivo in zip(columnas, [ruta] + subtitulos):
+                        nombre = os.path.basename(archivo)
+                        columna.link_button(f"Descargar {nombre}",
+                                            url_video(job["id"], nombre, descargar=True, base=base_videos))
+                    st.session_state.video_path = ruta
+                if rutas and job["params"].get("borrador"):
+                    # El render final reutiliza el audio que el borrador dejó en la caché
+                    if st.button("Generar la versión final", key=f"promover_{job['id']}"):
+                        st.session_state.trabajos.append(cola.promover(job["id"]))
+                        st.rerun()
+            elif job["estado"] == FALLIDO:
+                st.error(f"Error al generar video: {job['error']}")
+                # Con checkpoint el render continúa desde el último segmento terminado
+                checkpoint = os.path.isdir(cola.checkpoint_dir(job["id"]))
+                if not os.path.isdir(cola.work_dir(job["id"])):
+                    st.info("Los archivos del trabajo se han eliminado por la política de retención")
+                elif st.button("Reanudar" if checkpoint else "Reintentar", key=f"reanudar_{job['id']}"):
+                    cola.reanudar(job["id"])
+                    st.rerun()
 
 
 def main():
@@ -318,46 +192,90 @@ def main():
         text_color = st.color_picker("Color de texto", value="#ffffff")
         background_image = st.file_uploader("Imagen de fondo (opcional)", type=["png", "jpg", "jpeg", "webp"])
         stretch_background = st.checkbox("Estirar imagen de fondo", value=False)
+        borrador = st.checkbox(f"Borrador rápido ({DRAFT_SIZE[0]}x{DRAFT_SIZE[1]}, {DRAFT_FPS} fps)",
+                               value=False)
+        rango_segmentos = None
+        voz_economica = False
+        if borrador:
+            total = len(segmentar_texto(uploaded_file.getvalue().decode("utf-8"))) if uploaded_file else 0
+            if total > 1:
+                desde, hasta = st.slider("Segmentos del borrador", min_value=1, max_value=total,
+                                         value=(1, total))
+                if (desde, hasta) != (1, total):
+                    rango_segmentos = [desde - 1, hasta]
+            voz_economica = st.checkbox("Voz Standard (más barata; la versión final vuelve a sintetizar)",
+                                        value=False)
+        backend = st.selectbox("Motor de render", options=list(RENDER_BACKENDS.keys()),
+                               format_func=RENDER_BACKENDS.get, disabled=borrador)
+        encode_workers = ENCODE_WORKERS
+        if backend == 'paralelo':
+            encode_workers = st.number_input("Procesos de codificación", min_value=1, max_value=64,
+                                             value=ENCODE_WORKERS)
+        karaoke = False
+        if backend == 'moviepy' and not borrador:
+            karaoke = st.checkbox("Resaltar la palabra que se está leyendo", value=False)
+        movimiento_fondo = False
+        if backend == 'moviepy' and not borrador and not karaoke and background_image:
+            movimiento_fondo = st.checkbox("Movimiento lento de la imagen de fondo", value=False)
+        perfiles = []
+        if backend in ('ffmpeg', 'paralelo') and not borrador:
+            perfiles = st.multiselect("Versiones de salida (vacío: un solo video 720p)",
+                                      options=list(OUTPUT_PROFILES.keys()))
+        voces_adicionales = []
+        if borrador or backend in VOICE_TRACK_BACKENDS:
+            voces_adicionales = st.multiselect("Voces adicionales (una pista de audio por voz, mismo video)",
+                                               options=[v for v in VOCES_DISPONIBLES if v != voz_seleccionada])
+            if borrador and voces_adicionales and backend not in VOICE_TRACK_BACKENDS:
+                st.caption(f"Con varias voces la versión final usa el motor {RENDER_BACKENDS[DRAFT_BACKEND]}")
+        tts_lotes = not karaoke and st.checkbox("Agrupar segmentos en una sola petición de voz (SSML)",
+                                                value=False)
+        audio_pcm = tts_lotes or st.checkbox("Audio PCM en memoria (sin archivos temporales por segmento)",
+                                             value=False)
+        silencio_segmentos = 0.0
+        if audio_pcm:
+            silencio_segmentos = st.slider("Silencio entre segmentos (s)", min_value=0.0, max_value=2.0,
+                                           value=0.0, step=0.1)
 
-
-    logo_url = "https://yt3.ggpht.com/pBI3iT87_fX91PGHS5gZtbQi53nuRBIvOsuc-Z-hXaE3GxyRQF8-vEIDYOzFz93dsKUEjoHEwQ=s176-c-k-c0x00ffffff-no-rj"
     
     if uploaded_file:
         texto = uploaded_file.read().decode("utf-8")
         nombre_salida = st.text_input("Nombre del Video (sin extensión)", "video_generado")
         
         if st.button("Generar Video"):
-            with st.spinner('Generando video...'):
-                nombre_salida_completo = f"{nombre_salida}.mp4"
-                
-                
-                img_path = None
-                if background_image:
-                    with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(background_image.name)[1]) as tmp_file:
-                        tmp_file.write(background_image.read())
-                        img_path = tmp_file.name
-                
-                success, message = create_simple_video(texto, nombre_salida_completo, voz_seleccionada, logo_url,
-                                                        font_size, bg_color, text_color, img_path, stretch_background)
-                if success:
-                  st.success(message)
-                  st.video(nombre_salida_completo)
-                  with open(nombre_salida_completo, 'rb') as file:
-                    st.download_button(label="Descargar video",data=file,file_name=nombre_salida_completo)
-                    
-                  st.session_state.video_path = nombre_salida_completo
-                  if img_path:
-                    os.remove(img_path)
-                else:
-                  st.error(f"Error al generar video: {message}")
-                  if img_path:
-                    os.remove(img_path)
+            nombre_salida_completo = f"{nombre_salida}.mp4"
+            
+            img_path = None
+            if background_image:
+                with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(background_image.name)[1]) as tmp_file:
+                    tmp_file.write(background_image.read())
+                    img_path = tmp_file.name
+            
+            params = dict(texto=texto, nombre_salida=nombre_salida_completo, voz=voz_seleccionada,
+                          logo_url=LOGO_URL, font_size=font_size, bg_color=bg_color,
+                          text_color=text_color, background_image=None,
+                          stretch_background=stretch_background, backend=backend,
+                          encode_workers=encode_workers, audio_pcm=audio_pcm,
+                          silencio_segmentos=silencio_segmentos, tts_lotes=tts_lotes,
+                          perfiles=perfiles or None, karaoke=karaoke,
+                          movimiento_fondo=movimiento_fondo, borrador=borrador,
+                          rango_segmentos=rango_segmentos, voz_economica=voz_economica,
+                          voces_adicionales=voces_adicionales or None)
+            job_id = get_job_queue().submit(params, archivos={"background_image": img_path} if img_path else None)
+            st.session_state.trabajos.append(job_id)
+            if img_path:
+              os.remove(img_path)
+            st.success(f"Trabajo {job_id} en cola")
 
         if st.session_state.get("video_path"):
             st.markdown(f'<a href="https://www.youtube.com/upload" target="_blank">Subir video a YouTube</a>', unsafe_allow_html=True)
 
+    get_video_server()
+    mostrar_trabajos(get_job_queue())
+
 if __name__ == "__main__":
     # Inicializar session state
     if "video_path" not in st.session_state:
         st.session_state.video_path = None
+    if "trabajos" not in st.session_state:
+        st.session_state.trabajos = []
     main()
@@ -0,0 +1,98 @@
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+
+# Constantes
+INCREMENTAL_DIR = "renders"
+MANIFEST_VERSION = 1
+
+
+def hash_texto(*partes):
+    """Returns a stable SHA-256 of the given values."""
+    datos = json.dumps(partes, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(datos.encode("utf-8")).hexdigest()
+
+
+def hash_archivo(ruta):
+    """Returns the SHA-256 of a file's content, or None if there is no file."""
+    if not ruta:
+        return None
+    h = hashlib.sha256()
+    with open(ruta, "rb") as f:
+        for bloque in iter(lambda: f.read(1 << 20), b""):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+class RenderManifest:
+    """Per-output record of the segments and encoded chunks of the last render.
+
+    Renders that share an output name share its manifest: hold bloqueo()
+    from diff() to save() so they take turns instead of overwriting each
+    other's manifest and chunks.
+    """
+
+    def __init__(self, directorio):
+        self.directorio = directorio
+        self.ruta = os.path.join(directorio, "manifest.json")
+        self.chunks_dir = os.path.join(directorio, "chunks")
+        os.makedirs(self.chunks_dir, exist_ok=True)
+        self._cargar()
+
+    def _cargar(self):
+        self.segmentos = []
+        if os.path.exists(self.ruta):
+            try:
+                with open(self.ruta, encoding="utf-8") as f:
+                    datos = json.load(f)
+                if datos.get("version") == MANIFEST_VERSION:
+                    self.segmentos = datos["segmentos"]
+            except (OSError, ValueError, KeyError) as e:
+                logging.warning(f"Manifiesto ilegible en {self.ruta}, se ignora: {str(e)}")
+
+    @contextmanager
+    def bloqueo(self):
+        """Holds an exclusive lock on the manifest (across processes) and reloads it."""
+        with open(os.path.join(self.directorio, "manifest.lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            self._cargar()
+            yield self
+
+    def chunk_path(self, clave):
+        return os.path.join(self.chunks_dir, f"{clave}.mp4")
+
+    def has_chunk(self, clave):
+        return os.path.exists(self.chunk_path(clave))
+
+    def diff(self, claves):
+        """Returns the indices of the new segment list whose chunk must be regenerated.
+
+        Chunks are named by their content and written atomically, so a chunk
+        encoded by a render that failed before saving the manifest is reused.
+        """
+        return [i for i, clave in enumerate(claves) if not self.has_chunk(clave)]
+
+    def save(self, segmentos):
+        """Stores the new segment list and removes the chunks it replaced.
+
+        Only chunks of the previous list are removed: others may belong to
+        a render that has not saved its manifest yet.
+        """
+        anteriores = {f"{s['chunk']}.mp4" for s in self.segmentos}
+        self.segmentos = segmentos
+        temporal = self.ruta + ".tmp"
+        with open(temporal, "w", encoding="utf-8") as f:
+            json.dump({"version": MANIFEST_VERSION, "actualizado": time.time(),
+                       "segmentos": segmentos}, f, ensure_ascii=False, indent=1)
+        os.replace(temporal, self.ruta)
+
+        vigentes = {f"{s['chunk']}.mp4" for s in segmentos}
+        for nombre in anteriores - vigentes:
+            try:
+                os.remove(os.path.join(self.chunks_dir, nombre))
+            except OSError:
+                pass
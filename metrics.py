@@ -0,0 +1,265 @@
+import fcntl
+import glob
+import json
+import os
+import resource
+import threading
+import time
+from contextlib import contextmanager
+
+# Constantes
+METRICS_DIR = "metrics"
+METRICS_FILE = os.path.join(METRICS_DIR, "render.prom")
+STAGE_BUCKETS = (1, 5, 15, 30, 60, 120, 300, 600, 1800)
+TTS_LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+MEMORY_SAMPLE_INTERVAL = 0.1  # segundos entre muestras de memoria durante un render
+
+# nombre: (tipo, ayuda, buckets)
+PROMETHEUS_METRICS = {
+    "video_renders_total": ("counter", "Renders terminados por backend y resultado.", None),
+    "video_render_stage_seconds": ("histogram", "Duración de cada etapa del render.", STAGE_BUCKETS),
+    "video_tts_request_seconds": ("histogram", "Latencia de cada petición TTS correcta.",
+                                  TTS_LATENCY_BUCKETS),
+    "video_tts_retries_total": ("counter", "Reintentos de TTS por errores de cuota.", None),
+    "video_slides_rendered_total": ("counter", "Diapositivas rasterizadas.", None),
+    "video_slide_render_seconds_total": ("counter", "Tiempo total rasterizando diapositivas.", None),
+    "video_encoded_frames_total": ("counter", "Fotogramas de video codificados.", None),
+    "video_encode_seconds_total": ("counter", "Tiempo total en la etapa de codificación.", None),
+    "video_render_peak_rss_bytes": ("gauge", "Memoria residente máxima del último render.", None),
+    "video_render_children_peak_rss_bytes": ("gauge", "Memoria residente máxima de los procesos hijos "
+                                                      "(ffmpeg) del último render.", None),
+    "video_render_temp_disk_bytes": ("gauge", "Disco temporal máximo del último render.", None),
+}
+
+
+def _rss(pid="self"):
+    """Returns the resident memory of a process in bytes, or 0 if it is gone."""
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def _descendientes(pid="self"):
+    """Returns the pids of the children of a process, and of their children."""
+    pids = []
+    for ruta in glob.glob(f"/proc/{pid}/task/*/children"):
+        try:
+            with open(ruta) as f:
+                hijos = f.read().split()
+        except OSError:
+            continue
+        for hijo in hijos:
+            pids.append(hijo)
+            pids.extend(_descendientes(hijo))
+    return pids
+
+
+def _sin_exec(pid):
+    """True if a child is still a fork of this process that has not exec'd ffmpeg yet.
+
+    Until then its RSS counts the parent's pages, which would double count them.
+    """
+    try:
+        return os.readlink(f"/proc/{pid}/exe") == os.readlink("/proc/self/exe")
+    except OSError:
+        return True
+
+
+class RenderMetrics:
+    """Thread-safe timings and resource usage collected while rendering one video."""
+
+    def __init__(self):
+        self.etapas = {}
+        self.tts_latencias = []
+        self.tts_reintentos = 0
+        self.diapositivas = {}
+        self.frames = 0
+        self.disco_bytes = 0
+        self.memoria_bytes = None
+        self.memoria_hijos_bytes = None
+        self._muestreo = None
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def etapa(self, nombre):
+        """Times a stage; repeated spans of the same stage are added together."""
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.etapas[nombre] = self.etapas.get(nombre, 0.0) + time.perf_counter() - inicio
+
+    def medir_iter(self, nombre, iterable):
+        """Yields from ``iterable``, adding the time spent waiting for each item to a stage."""
+        iterador = iter(iterable)
+        while True:
+            with self.etapa(nombre):
+                try:
+                    item = next(iterador)
+                except StopIteration:
+                    return
+            yield item
+
+    def observe_tts(self, segundos, reintentos):
+        with self.lock:
+            self.tts_latencias.append(segundos)
+            self.tts_reintentos += reintentos
+
+    def add_frames(self, frames):
+        with self.lock:
+            self.frames += frames
+
+    def medir_disco(self, rutas):
+        """Records the size of the given temporary files if it is a new maximum."""
+        total = sum(os.path.getsize(r) for r in rutas if os.path.isfile(r))
+        with self.lock:
+            self.disco_bytes = max(self.disco_bytes, total)
+
+    def iniciar_muestreo(self, intervalo=MEMORY_SAMPLE_INTERVAL):
+        """Starts sampling the resident memory of this process and of its children.
+
+        The children are the ffmpeg encoders, summed. Samples are taken every
+        ``intervalo`` seconds until detener_muestreo(), so the peaks belong
+        to this render alone, even in a long-lived worker. Needs /proc (Linux).
+        """
+        if self._muestreo is not None or not os.path.exists("/proc/self/statm"):
+            return
+        parar = threading.Event()
+        self.memoria_bytes = self.memoria_hijos_bytes = 0
+
+        def _muestrear():
+            while True:
+                propia = _rss()
+                hijos = sum(_rss(pid) for pid in _descendientes() if not _sin_exec(pid))
+                with self.lock:
+                    self.memoria_bytes = max(self.memoria_bytes, propia)
+                    self.memoria_hijos_bytes = max(self.memoria_hijos_bytes, hijos)
+                if parar.wait(intervalo):
+                    return
+
+        hilo = threading.Thread(target=_muestrear, name="muestreo-memoria", daemon=True)
+        self._muestreo = (parar, hilo)
+        hilo.start()
+
+    def detener_muestreo(self):
+        if self._muestreo is not None:
+            parar, hilo = self._muestreo
+            parar.set()
+            hilo.join()
+            self._muestreo = None
+
+    def resumen(self):
+        """Returns a JSON-serializable breakdown of the render."""
+        latencias = sorted(self.tts_latencias)
+        codificacion = self.etapas.get("codificacion", 0.0)
+        return {
+            "etapas_s": {k: round(v, 3) for k, v in self.etapas.items()},
+            "tts": {
+                "peticiones": len(latencias),
+                "latencia_media_s": round(sum(latencias) / len(latencias), 3) if latencias else None,
+                "latencia_p95_s": round(latencias[int(0.95 * (len(latencias) - 1))], 3) if latencias else None,
+                "reintentos": self.tts_reintentos,
+            },
+            "diapositivas": self.diapositivas,
+            "frames": self.frames,
+            "codificacion_fps": round(self.frames / codificacion, 1) if codificacion else None,
+            "disco_temporal_bytes": self.disco_bytes,
+            # Picos muestreados durante este render (None sin /proc)
+            "memoria_pico_bytes": self.memoria_bytes,
+            "memoria_hijos_pico_bytes": self.memoria_hijos_bytes,
+            # ru_maxrss (KiB en Linux) cubre toda la vida del proceso, no solo este render; para
+            # los hijos es el del mayor de los que ya terminaron, contando la copia de este
+            # proceso que tienen antes del exec
+            "memoria_pico_proceso_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+            "memoria_hijo_pico_proceso_bytes": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * 1024,
+        }
+
+
+def _etiquetas(**etiquetas):
+    return ",".join(f'{k}="{v}"' for k, v in sorted(etiquetas.items()))
+
+
+def _observar(estado, nombre, valor, **etiquetas):
+    buckets = PROMETHEUS_METRICS[nombre][2]
+    serie = estado.setdefault(nombre, {}).setdefault(
+        _etiquetas(**etiquetas), {"buckets": [0] * len(buckets), "sum": 0.0, "count": 0})
+    for i, limite in enumerate(buckets):
+        if valor <= limite:
+            serie["buckets"][i] += 1
+    serie["sum"] += valor
+    serie["count"] += 1
+
+
+def _sumar(estado, nombre, valor, **etiquetas):
+    series = estado.setdefault(nombre, {})
+    clave = _etiquetas(**etiquetas)
+    series[clave] = series.get(clave, 0) + valor
+
+
+def _fijar(estado, nombre, valor, **etiquetas):
+    estado.setdefault(nombre, {})[_etiquetas(**etiquetas)] = valor
+
+
+def _formatear(estado):
+    lineas = []
+    for nombre, (tipo, ayuda, buckets) in PROMETHEUS_METRICS.items():
+        if nombre not in estado:
+            continue
+        lineas.append(f"# HELP {nombre} {ayuda}")
+        lineas.append(f"# TYPE {nombre} {tipo}")
+        for etiquetas, valor in sorted(estado[nombre].items()):
+            if tipo != "histogram":
+                lineas.append(f"{nombre}{{{etiquetas}}} {valor}" if etiquetas else f"{nombre} {valor}")
+                continue
+            prefijo = etiquetas + "," if etiquetas else ""
+            for limite, n in zip(buckets, valor["buckets"]):
+                lineas.append(f'{nombre}_bucket{{{prefijo}le="{limite}"}} {n}')
+            lineas.append(f'{nombre}_bucket{{{prefijo}le="+Inf"}} {valor["count"]}')
+            sufijo = f"{{{etiquetas}}}" if etiquetas else ""
+            lineas.append(f"{nombre}_sum{sufijo} {round(valor['sum'], 6)}")
+            lineas.append(f"{nombre}_count{sufijo} {valor['count']}")
+    return "\n".join(lineas) + "\n"
+
+
+def exportar_prometheus(metricas, backend, exito, ruta=METRICS_FILE):
+    """Adds a finished render to the cumulative Prometheus text file at ``ruta``.
+
+    The file follows the node_exporter textfile format. The running totals
+    are kept next to it in ``ruta``.json and updated under a file lock, so
+    several worker processes can export concurrently.
+    """
+    os.makedirs(os.path.dirname(ruta) or ".", exist_ok=True)
+    resumen = metricas.resumen()
+    with open(ruta + ".lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            with open(ruta + ".json", encoding="utf-8") as f:
+                estado = json.load(f)
+        except (OSError, ValueError):
+            estado = {}
+
+        _sumar(estado, "video_renders_total", 1, backend=backend,
+               resultado="ok" if exito else "error")
+        for etapa, segundos in metricas.etapas.items():
+            _observar(estado, "video_render_stage_seconds", segundos, etapa=etapa)
+        for segundos in metricas.tts_latencias:
+            _observar(estado, "video_tts_request_seconds", segundos)
+        _sumar(estado, "video_tts_retries_total", metricas.tts_reintentos)
+        _sumar(estado, "video_slides_rendered_total", metricas.diapositivas.get("renders", 0))
+        _sumar(estado, "video_slide_render_seconds_total",
+               metricas.diapositivas.get("render_ms_total", 0) / 1000)
+        _sumar(estado, "video_encoded_frames_total", metricas.frames)
+        _sumar(estado, "video_encode_seconds_total", metricas.etapas.get("codificacion", 0.0))
+        if resumen["memoria_pico_bytes"] is not None:
+            _fijar(estado, "video_render_peak_rss_bytes", resumen["memoria_pico_bytes"])
+            _fijar(estado, "video_render_children_peak_rss_bytes", resumen["memoria_hijos_pico_bytes"])
+        _fijar(estado, "video_render_temp_disk_bytes", resumen["disco_temporal_bytes"])
+
+        for destino, contenido in ((ruta + ".json", json.dumps(estado)), (ruta, _formatear(estado))):
+            temporal = destino + ".tmp"
+            with open(temporal, "w", encoding="utf-8") as f:
+                f.write(contenido)
+            os.replace(temporal, destino)
@@ -0,0 +1,117 @@
+import logging
+import threading
+import time
+
+# Constantes
+TTS_HEALTH_INTERVAL = 300  # segundos sin comprobar el cliente antes de volver a hacerlo
+TTS_HEALTH_TIMEOUT = 10
+TTS_HEALTH_LANGUAGE = "es-ES"
+
+
+class ResourceRegistry:
+    """Heavy resources shared by every render of a process: warm TTS clients,
+    fonts and end-cards.
+
+    A TTS client (and its gRPC channel) is created once per API version and
+    reused; if it has not been checked for ``health_interval`` seconds, or a
+    render using it failed, it is probed with a cheap list_voices call and
+    replaced when the probe fails.
+    """
+
+    def __init__(self, health_interval=TTS_HEALTH_INTERVAL, health_timeout=TTS_HEALTH_TIMEOUT):
+        self.health_interval = health_interval
+        self.health_timeout = health_timeout
+        self._clientes = {}
+        self._comprobado = {}
+        self._lock = threading.Lock()
+        self.reconexiones = 0
+
+    def _crear(self, beta):
+        from google.cloud import texttospeech, texttospeech_v1beta1
+
+        return texttospeech_v1beta1.TextToSpeechClient() if beta else texttospeech.TextToSpeechClient()
+
+    def _sano(self, cliente):
+        try:
+            cliente.list_voices(language_code=TTS_HEALTH_LANGUAGE, retry=None, timeout=self.health_timeout)
+            return True
+        except Exception as e:
+            logging.warning(f"El cliente TTS no responde, se vuelve a conectar: {str(e)}")
+            return False
+
+    def _cerrar(self, cliente):
+        try:
+            cliente.transport.close()
+        except Exception:
+            pass
+
+    def tts_client(self, beta=False):
+        """Returns the shared TTS client (v1beta1 if ``beta``), reconnecting it if unhealthy."""
+        with self._lock:
+            cliente = self._clientes.get(beta)
+            if cliente is not None and time.monotonic() - self._comprobado[beta] > self.health_interval:
+                if not self._sano(cliente):
+                    self._cerrar(cliente)
+                    self.reconexiones += 1
+                    cliente = None
+                else:
+                    self._comprobado[beta] = time.monotonic()
+            if cliente is None:
+                cliente = self._crear(beta)
+                self._clientes[beta] = cliente
+                self._comprobado[beta] = time.monotonic()
+            return cliente
+
+    def sospechoso(self, cliente):
+        """Marks a client for a health check before its next use, e.g. after a failed render."""
+        with self._lock:
+            for beta, actual in self._clientes.items():
+                if actual is cliente:
+                    self._comprobado[beta] = float("-inf")
+
+    def precalentar(self, beta=False, logo_url=None):
+        """Creates the TTS client and opens its channel, and loads fonts and the end-card.
+
+        Meant for idle time (a worker starting up), so the first render
+        does not pay for it. Failures are only logged: the render will
+        retry them.
+        """
+        from video import FONT_PATH, DEFAULT_FONT_SIZE, create_subscription_image
+        from slides import cargar_fuente
+
+        inicio = time.perf_counter()
+        try:
+            with self._lock:
+                cliente = self._clientes.get(beta) or self._crear(beta)
+                self._clientes[beta] = cliente
+                # La primera llamada abre el canal y obtiene el token de acceso
+                if self._sano(cliente):
+                    self._comprobado[beta] = time.monotonic()
+                else:
+                    self._comprobado[beta] = float("-inf")
+        except Exception as e:
+            logging.warning(f"No se pudo crear el cliente TTS: {str(e)}")
+        cargar_fuente(FONT_PATH, DEFAULT_FONT_SIZE)
+        if logo_url:
+            create_subscription_image(logo_url)
+        logging.info(f"Recursos precargados en {time.perf_counter() - inicio:.2f} s")
+
+    def cerrar(self):
+        with self._lock:
+            for cliente in self._clientes.values():
+                self._cerrar(cliente)
+            self._clientes.clear()
+            self._comprobado.clear()
+
+
+_registro = None
+_registro_lock = threading.Lock()
+
+
+def get_registry():
+    """Returns the process-wide resource registry."""
+    global _registro
+    with _registro_lock:
+        if _registro is None:
+            _registro = ResourceRegistry()
+        return _registro
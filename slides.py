@@ -0,0 +1,255 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from PIL import Image, ImageDraw, ImageFont
+import numpy as np
+
+# Constantes
+SLIDE_CACHE_SIZE = 16
+LAYOUT_CACHE_SIZE = 256
+MIN_FONT_SIZE = 10
+TEXT_MARGIN = 60
+LINE_HEIGHT_FACTOR = 1.5
+
+_fuentes = {}
+_fuentes_lock = threading.Lock()
+
+
+def cargar_fuente(font_path, font_size):
+    """Returns the font for (path, size), loaded once per process."""
+    clave = (font_path, font_size)
+    with _fuentes_lock:
+        if clave not in _fuentes:
+            try:
+                _fuentes[clave] = ImageFont.truetype(font_path, font_size)
+            except Exception as e:
+                logging.error(f"Error al cargar la fuente, usando la fuente predeterminada: {str(e)}")
+                _fuentes[clave] = ImageFont.load_default()
+        return _fuentes[clave]
+
+
+class TextLayout:
+    """Wrapped lines of a text block laid out for one font size."""
+
+    def __init__(self, lines, widths, font, font_size):
+        self.lines = lines
+        self.widths = widths
+        self.font = font
+        self.font_size = font_size
+        self.line_height = font_size * LINE_HEIGHT_FACTOR
+
+    @property
+    def height(self):
+        return len(self.lines) * self.line_height
+
+    @property
+    def width(self):
+        return max(self.widths) if self.widths else 0
+
+    def draw(self, draw, size, fill):
+        """Draws the block centered on an image of the given size."""
+        y = (size[1] - self.height) // 2
+        for line, ancho in zip(self.lines, self.widths):
+            x = (size[0] - ancho) // 2
+            draw.text((x, y), line, font=self.font, fill=fill)
+            y += self.line_height
+
+    def word_boxes(self, size, pad=2):
+        """Returns ((x, y), word, (x0, y0, x1, y1)) for every word as draw() places it.
+
+        (x, y) is the text origin of the word and the box is its pixel area,
+        padded and clipped to the slide, in text order.
+        """
+        cajas = []
+        y = (size[1] - self.height) // 2
+        for line, ancho in zip(self.lines, self.widths):
+            x = (size[0] - ancho) // 2
+            inicio = 0
+            for palabra in line.split(' '):
+                if palabra:
+                    x0 = x + self.font.getlength(line[:inicio])
+                    caja = (max(0, int(x0) - pad), max(0, int(y) - pad),
+                            min(size[0], int(x0 + self.font.getlength(palabra)) + pad + 1),
+                            min(size[1], int(y + self.line_height) + pad))
+                    cajas.append(((x0, y), palabra, caja))
+                inicio += len(palabra) + 1
+            y += self.line_height
+        return cajas
+
+
+def wrap_words(words, anchos, ancho_espacio, max_width):
+    """Greedy single-pass wrap using precomputed word and space advances."""
+    lines = []
+    widths = []
+    current_line = []
+    current_width = 0
+    for word, ancho in zip(words, anchos):
+        nuevo_ancho = current_width + ancho_espacio + ancho if current_line else ancho
+        if current_line and nuevo_ancho > max_width:
+            lines.append(' '.join(current_line))
+            widths.append(current_width)
+            current_line = [word]
+            current_width = ancho
+        else:
+            current_line.append(word)
+            current_width = nuevo_ancho
+    if current_line or not lines:
+        lines.append(' '.join(current_line))
+        widths.append(current_width)
+    return lines, widths
+
+
+class SlideRenderer:
+    """Rendering context that reuses fonts, backgrounds and already rendered slides."""
+
+    def __init__(self, font_path, max_slides=SLIDE_CACHE_SIZE):
+        self.font_path = font_path
+        self.max_slides = max_slides
+        self._fuentes = {}
+        self._fondos = {}
+        self._slides = OrderedDict()
+        self._layouts = OrderedDict()
+        self._medidas = {}
+        self.renders = 0
+        self.hits = 0
+        self.render_time = 0.0
+
+    def font(self, font_size, font_path=None):
+        """Returns the font for (path, size), shared with the other renderers of the process."""
+        clave = (font_path or self.font_path, font_size)
+        if clave not in self._fuentes:
+            self._fuentes[clave] = cargar_fuente(*clave)
+        return self._fuentes[clave]
+
+    def _medir(self, font_size, word):
+        medidas = self._medidas.setdefault(font_size, {})
+        if word not in medidas:
+            medidas[word] = self.font(font_size).getlength(word)
+        return medidas[word]
+
+    def _wrap(self, words, font_size, max_width):
+        anchos = [self._medir(font_size, word) for word in words]
+        lines, widths = wrap_words(words, anchos, self._medir(font_size, ' '), max_width)
+        return TextLayout(lines, widths, self.font(font_size), font_size)
+
+    def layout(self, text, size, font_size, min_font_size=MIN_FONT_SIZE, margin=TEXT_MARGIN):
+        """Wraps the text and shrinks the font until the block fits the slide."""
+        clave = (text, tuple(size), font_size, min_font_size, margin)
+        if clave in self._layouts:
+            self._layouts.move_to_end(clave)
+            return self._layouts[clave]
+
+        words = text.split()
+        max_width = size[0] - margin
+        max_height = size[1] - margin
+
+        def cabe(lay):
+            return lay.height <= max_height and lay.width <= max_width
+
+        resultado = self._wrap(words, font_size, max_width)
+        if not cabe(resultado) and font_size > min_font_size:
+            # Búsqueda binaria del mayor tamaño que cabe, escalando los anchos ya
+            # medidos en lugar de cargar la fuente en cada tamaño probado
+            anchos = [self._medir(font_size, word) for word in words]
+            ancho_espacio = self._medir(font_size, ' ')
+
+            def cabe_estimado(tam):
+                escala = tam / font_size
+                lines, widths = wrap_words(words, [a * escala for a in anchos],
+                                           ancho_espacio * escala, max_width)
+                return len(lines) * tam * LINE_HEIGHT_FACTOR <= max_height and max(widths) <= max_width
+
+            bajo, alto = min_font_size, font_size - 1
+            elegido = min_font_size
+            while bajo <= alto:
+                medio = (bajo + alto) // 2
+                if cabe_estimado(medio):
+                    elegido = medio
+                    bajo = medio + 1
+                else:
+                    alto = medio - 1
+
+            # Confirmamos con medidas reales; el hinting puede desviar la estimación
+            resultado = self._wrap(words, elegido, max_width)
+            while not cabe(resultado) and elegido > min_font_size:
+                elegido -= 1
+                resultado = self._wrap(words, elegido, max_width)
+
+        self._layouts[clave] = resultado
+        if len(self._layouts) > LAYOUT_CACHE_SIZE:
+            self._layouts.popitem(last=False)
+        return resultado
+
+    def canvas(self, size, bg_color="black", background_image=None, stretch_background=False):
+        """Returns a fresh copy of the prepared background for the given size."""
+        clave = (background_image, tuple(size), bg_color, stretch_background)
+        if clave not in self._fondos:
+            self._fondos[clave] = self._preparar_fondo(size, bg_color, background_image,
+                                                      stretch_background)
+        return self._fondos[clave].copy()
+
+    def _preparar_fondo(self, size, bg_color, background_image, stretch_background):
+        if not background_image:
+            return Image.new('RGB', size, bg_color)
+        try:
+            img = Image.open(background_image).convert("RGB")
+            if stretch_background:
+                return img.resize(size)
+            img.thumbnail(size)
+            new_img = Image.new('RGB', size, bg_color)
+            new_img.paste(img, ((size[0]-img.width)//2, (size[1]-img.height)//2))
+            return new_img
+        except Exception as e:
+            logging.error(f"Error al cargar imagen de fondo: {str(e)}, usando fondo {bg_color}.")
+            return Image.new('RGB', size, bg_color)
+
+    def text_image(self, text, size, font_size, bg_color="black", text_color="white",
+                   background_image=None, stretch_background=False):
+        """Renders a text slide, returning a cached read-only array for repeated slides."""
+        clave = (text, tuple(size), font_size, bg_color, text_color, background_image,
+                 stretch_background)
+        if clave in self._slides:
+            self._slides.move_to_end(clave)
+            self.hits += 1
+            return self._slides[clave]
+
+        inicio = time.perf_counter()
+        img = self.canvas(size, bg_color, background_image, stretch_background)
+        draw = ImageDraw.Draw(img)
+        self.layout(text, size, font_size).draw(draw, size, text_color)
+
+        frame = np.array(img)
+        # La misma matriz se comparte entre diapositivas repetidas
+        frame.flags.writeable = False
+        self.render_time += time.perf_counter() - inicio
+        self.renders += 1
+
+        self._slides[clave] = frame
+        if len(self._slides) > self.max_slides:
+            self._slides.popitem(last=False)
+        return frame
+
+    def text_mask(self, text, size, font_size):
+        """Renders only the text block as an alpha mask.
+
+        Returns (box, mask) with the mask cropped to the box the text
+        covers, or (None, None) for an empty text.
+        """
+        inicio = time.perf_counter()
+        mascara = Image.new('L', size, 0)
+        self.layout(text, size, font_size).draw(ImageDraw.Draw(mascara), size, 255)
+        caja = mascara.getbbox()
+        self.render_time += time.perf_counter() - inicio
+        self.renders += 1
+        return (caja, mascara.crop(caja)) if caja else (None, None)
+
+    def stats(self):
+        """Returns render counters and the average cost per rendered slide."""
+        return {
+            "renders": self.renders,
+            "hits": self.hits,
+            "render_ms_total": round(self.render_time * 1000, 1),
+            "render_ms_avg": round(self.render_time * 1000 / self.renders, 2) if self.renders else 0.0,
+        }
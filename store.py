@@ -0,0 +1,82 @@
+import logging
+import os
+import shutil
+import time
+
+# Constantes
+OUTPUT_DIR = "outputs"
+OUTPUT_MAX_AGE = 30 * 24 * 3600  # segundos sin uso antes de borrar los videos de un trabajo
+OUTPUT_MAX_BYTES = 50 * 1024 ** 3  # 50 GB
+
+
+def _tamano_directorio(directorio):
+    total = 0
+    for raiz, _, archivos in os.walk(directorio):
+        for nombre in archivos:
+            try:
+                total += os.path.getsize(os.path.join(raiz, nombre))
+            except OSError:
+                pass
+    return total
+
+
+class OutputStore:
+    """Rendered videos kept in one directory per job, with age/size limits and LRU eviction.
+
+    The last use of a job's outputs is the modification time of its
+    directory, which is set when it is created and by tocar().
+    """
+
+    def __init__(self, directorio=OUTPUT_DIR, max_age=OUTPUT_MAX_AGE, max_bytes=OUTPUT_MAX_BYTES):
+        self.directorio = directorio
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        os.makedirs(directorio, exist_ok=True)
+
+    def job_dir(self, job_id):
+        ruta = os.path.join(self.directorio, job_id)
+        os.makedirs(ruta, exist_ok=True)
+        return ruta
+
+    def ruta(self, job_id, nombre):
+        """Returns the path of a stored file, or None if it is missing or outside the store."""
+        for parte in (job_id, nombre):
+            if not parte or parte.startswith(".") or parte != os.path.basename(parte):
+                return None
+        ruta = os.path.join(self.directorio, job_id, nombre)
+        return ruta if os.path.isfile(ruta) else None
+
+    def tocar(self, job_id):
+        """Marks the outputs of a job as used now."""
+        try:
+            os.utime(os.path.join(self.directorio, job_id))
+        except OSError:
+            pass
+
+    def limpiar(self, excluir=()):
+        """Deletes outputs unused for max_age, then the least recently used above max_bytes.
+
+        Jobs in ``excluir`` (e.g. the ones rendering) are never deleted.
+        Returns the ids of the deleted jobs.
+        """
+        entradas = []
+        for job_id in os.listdir(self.directorio):
+            ruta = os.path.join(self.directorio, job_id)
+            if job_id in excluir or not os.path.isdir(ruta):
+                continue
+            try:
+                entradas.append((os.path.getmtime(ruta), _tamano_directorio(ruta), job_id))
+            except OSError:
+                continue
+        total = sum(tam for _, tam, _ in entradas)
+        ahora = time.time()
+        borrados = []
+        for uso, tam, job_id in sorted(entradas):
+            if ahora - uso <= self.max_age and total <= self.max_bytes:
+                continue
+            shutil.rmtree(os.path.join(self.directorio, job_id), ignore_errors=True)
+            total -= tam
+            borrados.append(job_id)
+        if borrados:
+            logging.info(f"Videos eliminados por la política de retención: {', '.join(borrados)}")
+        return borrados
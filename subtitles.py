@@ -0,0 +1,55 @@
+import os
+import textwrap
+
+# Constantes
+SUBTITLE_LINE_CHARS = 42
+SUBTITLE_MAX_LINES = 2
+
+
+def dividir_cue(texto, inicio, fin, line_chars=SUBTITLE_LINE_CHARS, max_lines=SUBTITLE_MAX_LINES):
+    """Splits a segment into caption-sized cues of at most ``max_lines`` lines.
+
+    The segment's time is shared between its cues by character count.
+    Returns a list of (start, end, text) tuples.
+    """
+    lineas = textwrap.wrap(texto, line_chars) or [""]
+    bloques = ["\n".join(lineas[i:i + max_lines]) for i in range(0, len(lineas), max_lines)]
+    total = sum(len(b) for b in bloques) or 1
+    cues = []
+    t = inicio
+    for bloque in bloques:
+        siguiente = t + (fin - inicio) * len(bloque) / total
+        cues.append((t, siguiente, bloque))
+        t = siguiente
+    return cues
+
+
+def _tiempo(segundos, separador):
+    ms = int(round(segundos * 1000))
+    h, ms = divmod(ms, 3600000)
+    m, ms = divmod(ms, 60000)
+    s, ms = divmod(ms, 1000)
+    return f"{h:02d}:{m:02d}:{s:02d}{separador}{ms:03d}"
+
+
+def formatear_srt(cues):
+    return "".join(f"{i}\n{_tiempo(inicio, ',')} --> {_tiempo(fin, ',')}\n{texto}\n\n"
+                   for i, (inicio, fin, texto) in enumerate(cues, start=1))
+
+
+def formatear_vtt(cues):
+    return "WEBVTT\n\n" + "".join(f"{_tiempo(inicio, '.')} --> {_tiempo(fin, '.')}\n{texto}\n\n"
+                                  for inicio, fin, texto in cues)
+
+
+def escribir_subtitulos(cues, base):
+    """Writes ``base``.srt and ``base``.vtt and returns both paths."""
+    rutas = []
+    for extension, contenido in ((".srt", formatear_srt(cues)), (".vtt", formatear_vtt(cues))):
+        ruta = base + extension
+        temporal = ruta + ".tmp"
+        with open(temporal, "w", encoding="utf-8") as f:
+            f.write(contenido)
+        os.replace(temporal, ruta)
+        rutas.append(ruta)
+    return rutas
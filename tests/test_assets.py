@@ -0,0 +1,89 @@
+"""AssetFetcher against a local HTTP server standing in for the logo host.
+
+Run with: python -m pytest tests (or python -m unittest discover tests)
+"""
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from assets import AssetFetcher  # noqa: E402
+
+LOGO = b"\x89PNG logo de prueba"
+ETAG = '"logo-v1"'
+
+
+class LogoHandler(BaseHTTPRequestHandler):
+    peticiones = []
+
+    def do_GET(self):
+        self.peticiones.append(dict(self.headers))
+        if self.headers.get("If-None-Match") == ETAG:
+            self.send_response(304)
+            self.send_header("ETag", ETAG)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "image/png")
+        self.send_header("Content-Length", str(len(LOGO)))
+        self.send_header("ETag", ETAG)
+        self.end_headers()
+        self.wfile.write(LOGO)
+
+    def log_message(self, formato, *args):
+        pass
+
+
+class AssetFetcherTest(unittest.TestCase):
+    def setUp(self):
+        LogoHandler.peticiones = []
+        self.servidor = ThreadingHTTPServer(("127.0.0.1", 0), LogoHandler)
+        threading.Thread(target=self.servidor.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.servidor.server_port}/logo.png"
+        self.cache_dir = tempfile.mkdtemp(prefix="assets_")
+        # revalidate_after=0: cada fetch vuelve a preguntar al servidor
+        self.fetcher = AssetFetcher(self.cache_dir, session=requests.Session(), revalidate_after=0)
+
+    def tearDown(self):
+        self.apagar()
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def apagar(self):
+        if self.servidor:
+            self.servidor.shutdown()
+            self.servidor.server_close()
+            self.servidor = None
+
+    def test_descarga_y_revalida_con_etag(self):
+        self.assertEqual(self.fetcher.fetch(self.url), LOGO)
+        self.assertNotIn("If-None-Match", LogoHandler.peticiones[0])
+
+        self.assertEqual(self.fetcher.fetch(self.url), LOGO)
+        self.assertEqual(len(LogoHandler.peticiones), 2)
+        self.assertEqual(LogoHandler.peticiones[1].get("If-None-Match"), ETAG)
+
+    def test_no_revalida_antes_de_tiempo(self):
+        fetcher = AssetFetcher(self.cache_dir, session=requests.Session(), revalidate_after=3600)
+        fetcher.fetch(self.url)
+        self.assertEqual(fetcher.fetch(self.url), LOGO)
+        self.assertEqual(len(LogoHandler.peticiones), 1)
+
+    def test_copia_en_cache_sin_servidor(self):
+        self.fetcher.fetch(self.url)
+        self.apagar()
+        self.assertEqual(self.fetcher.fetch(self.url), LOGO)
+
+    def test_sin_cache_ni_servidor_falla(self):
+        self.apagar()
+        with self.assertRaises(requests.RequestException):
+            self.fetcher.fetch(self.url)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,39 @@
+"""Frame bookkeeping of the segment-parallel encoder.
+
+Run with: python -m pytest tests (or python -m unittest discover tests)
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from encoder import frame_counts, split_chunks  # noqa: E402
+
+DURACIONES = [1.37, 0.042, 2.5, 0.0, 3.333, 0.71, 1.9, 4.04, 0.2, 2.66]
+
+
+class FrameCountsTest(unittest.TestCase):
+    def test_suman_los_frames_del_total(self):
+        conteos = frame_counts(DURACIONES, fps=24)
+        self.assertEqual(sum(conteos), round(sum(DURACIONES) * 24))
+
+    def test_bloques_consecutivos_en_la_misma_rejilla(self):
+        partido = (frame_counts(DURACIONES[:4], fps=24) +
+                   frame_counts(DURACIONES[4:], fps=24, inicio=sum(DURACIONES[:4])))
+        self.assertEqual(partido, frame_counts(DURACIONES, fps=24))
+
+
+class SplitChunksTest(unittest.TestCase):
+    def test_chunks_cubren_todos_los_frames(self):
+        conteos = frame_counts(DURACIONES, fps=24)
+        for num_chunks in (1, 2, 3, 4, 20):
+            chunks = split_chunks(conteos, num_chunks)
+            self.assertLessEqual(len(chunks), num_chunks)
+            self.assertEqual(sum(conteos[i] for chunk in chunks for i in chunk), sum(conteos))
+            # Contiguos, en orden y sin los slides de cero frames
+            self.assertEqual([i for chunk in chunks for i in chunk],
+                             [i for i, n in enumerate(conteos) if n > 0])
+
+
+if __name__ == "__main__":
+    unittest.main()
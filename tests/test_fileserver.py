@@ -0,0 +1,35 @@
+"""Range header parsing of the video server.
+
+Run with: python -m pytest tests (or python -m unittest discover tests)
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fileserver import rango_solicitado  # noqa: E402
+
+
+class RangoSolicitadoTest(unittest.TestCase):
+    def test_sin_rango_se_sirve_entero(self):
+        self.assertIsNone(rango_solicitado(None, 1000))
+        self.assertIsNone(rango_solicitado("", 1000))
+        self.assertIsNone(rango_solicitado("bytes=-", 1000))
+        # Varios rangos no se soportan: se sirve el archivo completo
+        self.assertIsNone(rango_solicitado("bytes=0-1,5-9", 1000))
+
+    def test_rangos(self):
+        self.assertEqual(rango_solicitado("bytes=0-99", 1000), (0, 99))
+        self.assertEqual(rango_solicitado("bytes=500-", 1000), (500, 999))
+        self.assertEqual(rango_solicitado("bytes=900-5000", 1000), (900, 999))
+        self.assertEqual(rango_solicitado("bytes=-100", 1000), (900, 999))
+        self.assertEqual(rango_solicitado("bytes=-5000", 1000), (0, 999))
+
+    def test_rango_no_satisfacible(self):
+        for cabecera in ("bytes=1000-", "bytes=2000-3000", "bytes=50-10"):
+            with self.assertRaises(ValueError):
+                rango_solicitado(cabecera, 1000)
+
+
+if __name__ == "__main__":
+    unittest.main()
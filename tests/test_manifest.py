@@ -0,0 +1,60 @@
+"""Which segments an incremental re-render has to encode again.
+
+Run with: python -m pytest tests (or python -m unittest discover tests)
+"""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from manifest import RenderManifest, hash_texto  # noqa: E402
+
+
+class RenderManifestTest(unittest.TestCase):
+    def setUp(self):
+        self.directorio = tempfile.mkdtemp(prefix="manifest_")
+
+    def tearDown(self):
+        shutil.rmtree(self.directorio, ignore_errors=True)
+
+    def codificar(self, manifest, claves):
+        for clave in claves:
+            with open(manifest.chunk_path(clave), "wb") as f:
+                f.write(clave.encode())
+        manifest.save([{"chunk": clave} for clave in claves])
+
+    def test_diff_solo_los_segmentos_cambiados(self):
+        antes = [hash_texto(f"segmento {i}") for i in range(5)]
+        manifest = RenderManifest(self.directorio)
+        self.assertEqual(manifest.diff(antes), [0, 1, 2, 3, 4])
+        self.codificar(manifest, antes)
+
+        # Se edita el segundo segmento y se inserta uno nuevo al final
+        despues = antes[:1] + [hash_texto("segmento 1 editado")] + antes[2:] + [hash_texto("nuevo")]
+        manifest = RenderManifest(self.directorio)
+        self.assertEqual(manifest.segmentos, [{"chunk": clave} for clave in antes])
+        self.assertEqual(manifest.diff(despues), [1, 5])
+
+    def test_save_borra_los_chunks_reemplazados(self):
+        antes = [hash_texto(f"segmento {i}") for i in range(3)]
+        manifest = RenderManifest(self.directorio)
+        self.codificar(manifest, antes)
+        despues = [antes[0], hash_texto("otro"), antes[2]]
+        self.codificar(manifest, despues)
+        self.assertFalse(manifest.has_chunk(antes[1]))
+        self.assertEqual(manifest.diff(despues), [])
+        self.assertEqual(manifest.diff(antes), [1])
+
+    def test_chunk_sin_manifiesto_se_reutiliza(self):
+        # Un render que falló tras codificar pero antes de guardar el manifiesto
+        clave = hash_texto("segmento")
+        manifest = RenderManifest(self.directorio)
+        with open(manifest.chunk_path(clave), "wb") as f:
+            f.write(b"chunk")
+        self.assertEqual(RenderManifest(self.directorio).diff([clave, hash_texto("otro")]), [1])
+
+
+if __name__ == "__main__":
+    unittest.main()
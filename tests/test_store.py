@@ -0,0 +1,42 @@
+"""Paths handed out by the output store.
+
+Run with: python -m pytest tests (or python -m unittest discover tests)
+"""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from store import OutputStore  # noqa: E402
+
+
+class OutputStoreRutaTest(unittest.TestCase):
+    def setUp(self):
+        self.base = tempfile.mkdtemp(prefix="store_")
+        self.store = OutputStore(os.path.join(self.base, "outputs"))
+        with open(os.path.join(self.store.job_dir("abc123"), "video.mp4"), "wb") as f:
+            f.write(b"video")
+        # Un archivo fuera del store al que apuntan los intentos de salirse
+        with open(os.path.join(self.base, "secreto.txt"), "w") as f:
+            f.write("no")
+
+    def tearDown(self):
+        shutil.rmtree(self.base, ignore_errors=True)
+
+    def test_archivo_del_trabajo(self):
+        self.assertEqual(self.store.ruta("abc123", "video.mp4"),
+                         os.path.join(self.store.directorio, "abc123", "video.mp4"))
+        self.assertIsNone(self.store.ruta("abc123", "otro.mp4"))
+
+    def test_rechaza_salir_del_store(self):
+        for job_id, nombre in (("..", "secreto.txt"), ("abc123", "../../secreto.txt"),
+                               ("abc123/..", "video.mp4"), (self.base, "secreto.txt"),
+                               ("abc123", os.path.join(self.base, "secreto.txt")),
+                               (".", "abc123"), ("", "video.mp4"), ("abc123", "")):
+            self.assertIsNone(self.store.ruta(job_id, nombre), (job_id, nombre))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,34 @@
+"""Splitting segments into subtitle cues.
+
+Run with: python -m pytest tests (or python -m unittest discover tests)
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from subtitles import dividir_cue  # noqa: E402
+
+
+class DividirCueTest(unittest.TestCase):
+    def test_segmento_corto_es_un_solo_cue(self):
+        self.assertEqual(dividir_cue("Hola mundo.", 1.0, 2.5), [(1.0, 2.5, "Hola mundo.")])
+
+    def test_segmento_largo_se_reparte_el_tiempo(self):
+        texto = " ".join(["palabra"] * 40)
+        cues = dividir_cue(texto, 10.0, 20.0, line_chars=30, max_lines=2)
+        self.assertGreater(len(cues), 1)
+        for _, _, bloque in cues:
+            lineas = bloque.split("\n")
+            self.assertLessEqual(len(lineas), 2)
+            self.assertTrue(all(len(linea) <= 30 for linea in lineas))
+        self.assertEqual(" ".join(b.replace("\n", " ") for _, _, b in cues), texto)
+        # Cues contiguos que cubren todo el segmento
+        self.assertEqual(cues[0][0], 10.0)
+        self.assertAlmostEqual(cues[-1][1], 20.0)
+        for (_, fin, _), (inicio, _, _) in zip(cues, cues[1:]):
+            self.assertEqual(fin, inicio)
+
+
+if __name__ == "__main__":
+    unittest.main()
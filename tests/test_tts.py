@@ -0,0 +1,87 @@
+"""TTS helpers that do not need the API: the rate limiter and SSML batching.
+
+Run with: python -m pytest tests (or python -m unittest discover tests)
+"""
+import os
+import sys
+import time
+import unittest
+from types import SimpleNamespace
+
+import numpy as np
+from google.cloud import texttospeech
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from tts import TokenBucket, agrupar_lotes, sintetizar_lote, ssml_con_marcas  # noqa: E402
+
+SAMPLE_RATE = 24000
+
+
+class ClienteFalso:
+    """Answers every request with ``muestras`` of PCM and the given marks."""
+
+    def __init__(self, muestras, marcas):
+        self.muestras = muestras
+        self.marcas = marcas
+        self.peticiones = []
+
+    def synthesize_speech(self, request):
+        self.peticiones.append(request)
+        return SimpleNamespace(
+            audio_content=self.muestras.astype("<i2").tobytes(),
+            timepoints=[SimpleNamespace(mark_name=nombre, time_seconds=t)
+                        for nombre, t in self.marcas.items()])
+
+
+class TokenBucketTest(unittest.TestCase):
+    def test_rafaga_inicial_sin_esperas(self):
+        limitador = TokenBucket(600)  # 10 por segundo, ráfaga de 10
+        inicio = time.monotonic()
+        for _ in range(10):
+            limitador.acquire()
+        self.assertLess(time.monotonic() - inicio, 0.05)
+
+    def test_respeta_el_ritmo(self):
+        limitador = TokenBucket(600, capacity=1)
+        inicio = time.monotonic()
+        for _ in range(6):
+            limitador.acquire()
+        # El primero sale del cubo; los otros cinco esperan 0.1 s cada uno
+        self.assertGreaterEqual(time.monotonic() - inicio, 0.45)
+        self.assertLess(time.monotonic() - inicio, 1.0)
+
+
+class LotesTest(unittest.TestCase):
+    def setUp(self):
+        self.voz = texttospeech.VoiceSelectionParams(language_code="es-ES", name="es-ES-Standard-A")
+        self.config = texttospeech.AudioConfig(audio_encoding=texttospeech.AudioEncoding.LINEAR16,
+                                               sample_rate_hertz=SAMPLE_RATE)
+
+    def test_agrupar_lotes_respeta_el_limite(self):
+        segmentos = [f"Frase número {i} con algo de texto & <símbolos>." for i in range(40)]
+        lotes = agrupar_lotes(segmentos, max_bytes=300)
+        self.assertGreater(len(lotes), 1)
+        self.assertEqual([i for lote in lotes for i in lote], list(range(40)))
+        for lote in lotes:
+            self.assertLessEqual(len(ssml_con_marcas([segmentos[i] for i in lote]).encode("utf-8")), 300)
+
+    def test_segmento_mayor_que_el_limite_va_solo(self):
+        lotes = agrupar_lotes(["corto", "x" * 500, "corto"], max_bytes=300)
+        self.assertEqual(lotes, [[0], [1], [2]])
+
+    def test_sintetizar_lote_corta_en_las_marcas(self):
+        muestras = np.arange(SAMPLE_RATE * 3) % 1000
+        cliente = ClienteFalso(muestras, {"s0": 0.0, "s1": 1.0, "s2": 2.5})
+        audios = sintetizar_lote(cliente, ["uno", "dos", "tres"], self.voz, self.config)
+        self.assertEqual(len(cliente.peticiones), 1)
+        self.assertEqual([len(a) // 2 for a in audios], [SAMPLE_RATE, SAMPLE_RATE * 3 // 2, SAMPLE_RATE // 2])
+        self.assertEqual(b"".join(audios), muestras.astype("<i2").tobytes())
+
+    def test_sintetizar_lote_sin_marca_falla(self):
+        cliente = ClienteFalso(np.zeros(SAMPLE_RATE, dtype="<i2"), {"s0": 0.0, "s2": 0.5})
+        with self.assertRaisesRegex(Exception, "marca s1"):
+            sintetizar_lote(cliente, ["uno", "dos", "tres"], self.voz, self.config)
+
+
+if __name__ == "__main__":
+    unittest.main()
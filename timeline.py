@@ -0,0 +1,47 @@
+import bisect
+from collections import OrderedDict
+
+# Constantes
+TIMELINE_WINDOW = 2  # fotogramas de diapositiva que se mantienen en memoria
+
+
+class SlideTimeline:
+    """Lazy slide track: each slide is rendered when the encoder first reaches it.
+
+    Only the frames of the last ``ventana`` slides are kept, so memory does
+    not depend on the number of slides.
+    """
+
+    def __init__(self, ventana=TIMELINE_WINDOW):
+        self.ventana = ventana
+        self.inicios = []
+        self.fuentes = []
+        self.duracion = 0.0
+        self._frames = OrderedDict()
+
+    def add(self, render, duracion, dinamica=False):
+        """Appends a slide; ``render`` is called without arguments to produce its frame.
+
+        With ``dinamica`` it must return a function of the time since the
+        start of the slide instead, which is called for every frame.
+        """
+        self.inicios.append(self.duracion)
+        self.fuentes.append((render, dinamica))
+        self.duracion += duracion
+
+    def frame(self, t):
+        i = max(0, bisect.bisect_right(self.inicios, t) - 1)
+        render, dinamica = self.fuentes[i]
+        if i not in self._frames:
+            self._frames[i] = render()
+            if len(self._frames) > self.ventana:
+                self._frames.popitem(last=False)
+        if dinamica:
+            return self._frames[i](t - self.inicios[i])
+        return self._frames[i]
+
+    def clip(self):
+        """Returns a MoviePy clip that pulls frames from the timeline."""
+        from moviepy.video.VideoClip import VideoClip
+
+        return VideoClip(make_frame=self.frame, duration=self.duracion)
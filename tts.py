@@ -0,0 +1,292 @@
+import json
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from xml.sax.saxutils import escape
+
+from audio import decode_linear16, AUDIO_SAMPLE_RATE
+from audio_cache import clave_desde_config
+
+# Constantes
+TTS_MAX_WORKERS = 8
+TTS_REQUESTS_PER_MINUTE = 300
+TTS_MAX_RETRIES = 3
+TTS_BATCH_BYTES = 4800  # la API admite 5000 bytes de entrada por petición
+
+
+class TokenBucket:
+    """Thread-safe token bucket that limits requests per minute."""
+
+    def __init__(self, requests_per_minute, capacity=None):
+        self.rate = requests_per_minute / 60.0
+        # Por defecto permitimos ráfagas de un segundo de cuota
+        self.capacity = capacity if capacity is not None else max(1.0, self.rate)
+        self.tokens = self.capacity
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Blocks until a token is available and consumes it."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+                self.last = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                espera = (1 - self.tokens) / self.rate
+            time.sleep(espera)
+
+
+def es_error_de_cuota(e):
+    """Returns True if the error is a 429 / RESOURCE_EXHAUSTED from the TTS API."""
+    import grpc
+    from google.api_core import exceptions as google_exceptions
+
+    if isinstance(e, (google_exceptions.ResourceExhausted, google_exceptions.TooManyRequests)):
+        return True
+    if isinstance(e, grpc.RpcError) and callable(getattr(e, "code", None)):
+        return e.code() == grpc.StatusCode.RESOURCE_EXHAUSTED
+    return getattr(e, "grpc_status_code", None) == grpc.StatusCode.RESOURCE_EXHAUSTED
+
+
+def _con_reintentos(llamada, limitador=None, max_retries=TTS_MAX_RETRIES, metricas=None):
+    """Runs a TTS request, backing off on quota errors."""
+    for intento in range(max_retries + 1):
+        if limitador:
+            limitador.acquire()
+        try:
+            inicio = time.perf_counter()
+            respuesta = llamada()
+            if metricas is not None:
+                metricas.observe_tts(time.perf_counter() - inicio, intento)
+            return respuesta
+        except Exception as e:
+            logging.error(f"Error al solicitar audio (intento {intento + 1}): {str(e)}")
+            if not es_error_de_cuota(e):
+                raise
+            if intento < max_retries:
+                # Backoff exponencial con jitter para no sincronizar a los workers
+                time.sleep(2 ** (intento + 1) + random.uniform(0, 1))
+
+    raise Exception("Maximos intentos de reintento alcanzado")
+
+
+def sintetizar_segmento(client, segmento, voice, audio_config, limitador=None,
+                        max_retries=TTS_MAX_RETRIES, metricas=None):
+    """Synthesizes one segment, backing off on quota errors."""
+    from google.cloud import texttospeech
+
+    synthesis_input = texttospeech.SynthesisInput(text=segmento)
+    response = _con_reintentos(lambda: client.synthesize_speech(
+        input=synthesis_input,
+        voice=voice,
+        audio_config=audio_config
+    ), limitador, max_retries, metricas)
+    return response.audio_content
+
+
+def ssml_con_marcas(segmentos):
+    """Joins segments into one SSML document with a <mark name="sN"/> before each one."""
+    partes = [f'<mark name="s{i}"/>{escape(segmento)} ' for i, segmento in enumerate(segmentos)]
+    return "<speak>" + "".join(partes) + "</speak>"
+
+
+def agrupar_lotes(segmentos, max_bytes=TTS_BATCH_BYTES):
+    """Groups segment indices into batches whose SSML stays under ``max_bytes``."""
+    lotes = []
+    actual = []
+    tamano = len("<speak></speak>")
+    for i, segmento in enumerate(segmentos):
+        n = len(ssml_con_marcas([segmento]).encode("utf-8")) - len("<speak></speak>")
+        if actual and tamano + n > max_bytes:
+            lotes.append(actual)
+            actual = []
+            tamano = len("<speak></speak>")
+        actual.append(i)
+        tamano += n
+    if actual:
+        lotes.append(actual)
+    return lotes
+
+
+def _peticion_con_marcas(partes, voice, audio_config):
+    """Builds a v1beta1 request that returns the time of the mark before each part."""
+    from google.cloud import texttospeech_v1beta1
+
+    return texttospeech_v1beta1.SynthesizeSpeechRequest(
+        input=texttospeech_v1beta1.SynthesisInput(ssml=ssml_con_marcas(partes)),
+        voice=texttospeech_v1beta1.VoiceSelectionParams(type(voice).to_dict(voice)),
+        audio_config=texttospeech_v1beta1.AudioConfig(type(audio_config).to_dict(audio_config)),
+        enable_time_pointing=[texttospeech_v1beta1.SynthesizeSpeechRequest.TimepointType.SSML_MARK],
+    )
+
+
+def sintetizar_lote(client, segmentos, voice, audio_config, limitador=None,
+                    max_retries=TTS_MAX_RETRIES, metricas=None):
+    """Synthesizes several segments in one SSML request and splits the audio at the marks.
+
+    ``client`` must be a texttospeech_v1beta1 client (timepoints are only
+    returned by that API) and ``audio_config`` must be LINEAR16. Returns the
+    raw PCM of each segment.
+    """
+    from google.cloud import texttospeech
+
+    if audio_config.audio_encoding != texttospeech.AudioEncoding.LINEAR16:
+        raise Exception("La síntesis por lotes requiere audio LINEAR16")
+    sample_rate = audio_config.sample_rate_hertz or AUDIO_SAMPLE_RATE
+    request = _peticion_con_marcas(segmentos, voice, audio_config)
+    response = _con_reintentos(lambda: client.synthesize_speech(request=request),
+                               limitador, max_retries, metricas)
+
+    muestras = decode_linear16(response.audio_content, sample_rate)
+    marcas = {tp.mark_name: tp.time_seconds for tp in response.timepoints}
+    cortes = [0]
+    for i in range(1, len(segmentos)):
+        if f"s{i}" not in marcas:
+            raise Exception(f"La respuesta de TTS no incluye la marca s{i}")
+        cortes.append(min(len(muestras), max(cortes[-1], int(round(marcas[f"s{i}"] * sample_rate)))))
+    cortes.append(len(muestras))
+    return [muestras[inicio:fin].tobytes() for inicio, fin in zip(cortes, cortes[1:])]
+
+
+def sintetizar_palabras(client, segmento, voice, audio_config, limitador=None,
+                        max_retries=TTS_MAX_RETRIES, metricas=None):
+    """Synthesizes one segment with a mark before every word.
+
+    ``client`` must be a texttospeech_v1beta1 client. Returns the audio and
+    the start time in seconds of each word of ``segmento.split()``; a word
+    whose mark is missing starts with the previous one.
+    """
+    palabras = segmento.split()
+    request = _peticion_con_marcas(palabras, voice, audio_config)
+    response = _con_reintentos(lambda: client.synthesize_speech(request=request),
+                               limitador, max_retries, metricas)
+    marcas = {tp.mark_name: tp.time_seconds for tp in response.timepoints}
+    inicios = []
+    for j in range(len(palabras)):
+        anterior = inicios[-1] if inicios else 0.0
+        inicios.append(max(anterior, marcas.get(f"s{j}", anterior)))
+    return response.audio_content, inicios
+
+
+def empaquetar_palabras(audio, inicios):
+    """Prefixes the audio with the word start times so both share one cache entry."""
+    cabecera = json.dumps(inicios).encode("utf-8")
+    return len(cabecera).to_bytes(4, "little") + cabecera + audio
+
+
+def desempaquetar_palabras(datos):
+    """Inverse of empaquetar_palabras: returns (audio, word start times)."""
+    n = int.from_bytes(datos[:4], "little")
+    return datos[4 + n:], json.loads(datos[4:4 + n])
+
+
+def iter_sintesis(client, segmentos, voice, audio_config,
+                  max_workers=TTS_MAX_WORKERS,
+                  requests_per_minute=TTS_REQUESTS_PER_MINUTE,
+                  cache=None, progress=None, lotes=False, metricas=None, ventana=None,
+                  palabras=False):
+    """Yields the audio of each segment in order as it becomes available.
+
+    Segments already present in ``cache`` are not sent to the API; they are
+    read in the pool like the requests, and resynthesized there if evicted in
+    the meantime. At most ``ventana`` requests or reads (default: twice the
+    workers) are in flight or waiting to be consumed, so memory does not grow
+    with the text length.
+    ``progress`` is called with (done, total) as segments are yielded.
+    With ``lotes`` the missing segments are packed into SSML requests of up
+    to TTS_BATCH_BYTES (see sintetizar_lote) instead of one request each.
+    Request latencies and retries are recorded in ``metricas`` if given.
+    With ``palabras`` every segment is synthesized with word marks (see
+    sintetizar_palabras) and (audio, word start times) pairs are yielded.
+    """
+    if lotes and palabras:
+        raise Exception("Las marcas por palabra no son compatibles con la síntesis por lotes")
+    ventana = ventana or max_workers * 2
+    limitador = TokenBucket(requests_per_minute)
+    pool = ThreadPoolExecutor(max_workers=max_workers)
+
+    def _sintetizar(indices, claves):
+        if lotes:
+            audios = sintetizar_lote(client, [segmentos[i] for i in indices], voice, audio_config,
+                                     limitador, metricas=metricas)
+        elif palabras:
+            audios = [empaquetar_palabras(*sintetizar_palabras(client, segmentos[i], voice,
+                                                               audio_config, limitador,
+                                                               metricas=metricas))
+                      for i in indices]
+        else:
+            audios = [sintetizar_segmento(client, segmentos[i], voice, audio_config, limitador,
+                                          metricas=metricas)
+                      for i in indices]
+        if cache is not None:
+            for clave, audio in zip(claves, audios):
+                cache.put(clave, audio)
+        return audios
+
+    def _leer(indices, claves):
+        # La entrada pudo desalojarse desde que la comprobamos: get() ya contó el
+        # fallo, así que se vuelve a sintetizar en el pool sin contarlo otra vez
+        audio = cache.get(claves[0])
+        return [audio] if audio is not None else _sintetizar(indices, claves)
+
+    try:
+        # El audio con tiempos por palabra se guarda en la caché con otra clave
+        sufijo = ".palabras" if palabras else ""
+        claves = [clave_desde_config(segmento, voice, audio_config) + sufijo if cache is not None else None
+                  for segmento in segmentos]
+        pendientes = [i for i, clave in enumerate(claves) if cache is None or not cache.comprobar(clave)]
+        grupos = ([[pendientes[j] for j in lote]
+                   for lote in agrupar_lotes([segmentos[i] for i in pendientes])]
+                  if lotes else [[i] for i in pendientes])
+        if lotes:
+            logging.info(f"{len(pendientes)} segmentos en {len(grupos)} peticiones SSML")
+        # Los segmentos en caché también se leen en el pool, dentro de la ventana
+        faltan = set(pendientes)
+        trabajos = sorted([(grupo, _sintetizar) for grupo in grupos] +
+                          [([i], _leer) for i in range(len(segmentos)) if i not in faltan],
+                          key=lambda trabajo: trabajo[0][0])
+        grupos = [grupo for grupo, _ in trabajos]
+        tareas = [tarea for _, tarea in trabajos]
+        posicion = {i: (g, k) for g, grupo in enumerate(grupos) for k, i in enumerate(grupo)}
+        futuros = {}
+        siguiente = 0
+
+        for i in range(len(segmentos)):
+            g, k = posicion[i]
+            # Los grupos se consumen en orden: solo quedan en vuelo los que aún no se han
+            # leído, salvo el de este segmento si un lote a medio leer ocupa la ventana
+            while siguiente < len(grupos) and (len(futuros) < ventana or siguiente <= g):
+                futuros[siguiente] = pool.submit(tareas[siguiente], grupos[siguiente],
+                                                 [claves[j] for j in grupos[siguiente]])
+                siguiente += 1
+            audio = futuros[g].result()[k]
+            if k == len(grupos[g]) - 1:
+                del futuros[g]
+            logging.info(f"Segmento {i+1} de {len(segmentos)} sintetizado")
+            if progress:
+                progress(i + 1, len(segmentos))
+            yield desempaquetar_palabras(audio) if palabras else audio
+        if cache is not None:
+            logging.info(f"Caché de audio: {cache.stats()}")
+    finally:
+        # Si un segmento falla no seguimos gastando cuota en los pendientes
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def sintetizar_segmentos(client, segmentos, voice, audio_config,
+                         max_workers=TTS_MAX_WORKERS,
+                         requests_per_minute=TTS_REQUESTS_PER_MINUTE,
+                         cache=None, progress=None, lotes=False, metricas=None):
+    """Synthesizes all segments concurrently and returns the audio in segment order.
+
+    Same options as iter_sintesis, with every request allowed in flight at once.
+    """
+    return list(iter_sintesis(client, segmentos, voice, audio_config, max_workers=max_workers,
+                              requests_per_minute=requests_per_minute, cache=cache,
+                              progress=progress, lotes=lotes, metricas=metricas,
+                              ventana=max(1, len(segmentos))))
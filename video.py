@@ -0,0 +1,818 @@
+import os
+import logging
+from contextlib import ExitStack
+from functools import partial
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+from tts import sintetizar_segmentos, iter_sintesis, TTS_MAX_WORKERS, TTS_REQUESTS_PER_MINUTE
+from audio_cache import get_default_cache
+from slides import SlideRenderer
+from assets import subscription_card
+from audio import (decode_linear16, decode_mp3, concatenar_pcm, write_wav, pad_to_frames,
+                   NarracionWav, AUDIO_SAMPLE_RATE)
+from encoder import (encode_still_slides, encode_parallel, encode_video_chunk, mux_chunks,
+                     extraer_pista, HLSWriter, ENCODE_WORKERS)
+from audio_cache import clave_desde_config
+from manifest import RenderManifest, INCREMENTAL_DIR, hash_texto, hash_archivo
+from metrics import RenderMetrics
+from timeline import SlideTimeline, TIMELINE_WINDOW
+from checkpoint import RenderCheckpoint
+from subtitles import dividir_cue, escribir_subtitulos
+from karaoke import KaraokeSlide
+from kenburns import KenBurnsSlide, Piramide, tamano_base
+from resources import get_registry
+
+# Constantes
+TEMP_DIR = "temp"
+FONT_PATH = "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"  # Ajusta la ruta si es necesario
+DEFAULT_FONT_SIZE = 30
+#LINE_HEIGHT = 40 # Eliminamos LINE_HEIGHT como variable global
+VIDEO_FPS = 24
+VIDEO_CODEC = 'libx264'
+AUDIO_CODEC = 'aac'
+VIDEO_PRESET = 'ultrafast'
+VIDEO_THREADS = 4
+IMAGE_SIZE_TEXT = (1280, 360)
+IMAGE_SIZE_SUBSCRIPTION = (1280, 720)
+SUBSCRIPTION_DURATION = 5
+LOGO_SIZE = (100, 100)
+VIDEO_SIZE = (1280, 720)  # Tamaño estándar del video
+PROGRESSIVE_BLOCK_SEGMENTS = 3
+SUBTITLE_FPS = 1  # el fondo es fijo: basta un fotograma por segundo
+PREVIEW_DIR = os.path.join("static", "preview")
+DRAFT_SIZE = (640, 360)
+DRAFT_FPS = 6
+DRAFT_CRF = 32
+DRAFT_BACKEND = 'ffmpeg'
+VOICE_TRACK_BACKENDS = ('ffmpeg', 'paralelo', 'subtitulos')  # motores que admiten varias voces
+LOGO_URL = "https://yt3.ggpht.com/pBI3iT87_fX91PGHS5gZtbQi53nuRBIvOsuc-Z-hXaE3GxyRQF8-vEIDYOzFz93dsKUEjoHEwQ=s176-c-k-c0x00ffffff-no-rj"
+
+# Motores de render disponibles
+RENDER_BACKENDS = {
+    'moviepy': 'MoviePy (composición por fotograma)',
+    'ffmpeg': 'FFmpeg (diapositivas fijas, rápido)',
+    'paralelo': 'FFmpeg en paralelo (varios núcleos)',
+    'progresivo': 'Progresivo (vista previa HLS durante el render)',
+    'incremental': 'Incremental (reutiliza segmentos sin cambios)',
+    'subtitulos': 'Subtítulos (fondo fijo y texto como pista de subtítulos)',
+}
+
+# Versiones de salida: tamaño (ancho, alto), CRF de x264 y bitrate máximo en kbit/s
+OUTPUT_PROFILES = {
+    '1080p': {'size': (1920, 1080), 'crf': 20, 'bitrate': 6000},
+    '720p': {'size': (1280, 720), 'crf': 23, 'bitrate': 3000},
+    'short': {'size': (1080, 1920), 'crf': 23, 'bitrate': 5000},
+}
+
+# Configuración de voces (género como nombre de texttospeech.SsmlVoiceGender)
+VOCES_DISPONIBLES = {
+    'es-ES-Standard-B': 'MALE',
+    'es-ES-Standard-A': 'FEMALE',
+    'es-ES-Standard-C': 'FEMALE',
+    'es-ES-Standard-D': 'FEMALE',
+    'es-ES-Standard-E': 'FEMALE',
+    'es-ES-Standard-F': 'MALE',
+    'es-ES-Neural2-A': 'FEMALE',
+    'es-ES-Neural2-B': 'MALE',
+    'es-ES-Neural2-C': 'FEMALE',
+    'es-ES-Neural2-D': 'FEMALE',
+    'es-ES-Neural2-E': 'FEMALE',
+    'es-ES-Neural2-F': 'MALE',
+    'es-ES-Polyglot-1': 'MALE',
+    'es-ES-Studio-C': 'FEMALE',
+    'es-ES-Studio-F': 'MALE',
+    'es-ES-Wavenet-B': 'MALE',
+    'es-ES-Wavenet-C': 'FEMALE',
+    'es-ES-Wavenet-D': 'FEMALE',
+    'es-ES-Wavenet-E': 'MALE',
+    'es-ES-Wavenet-F': 'FEMALE',
+}
+
+# Voces Standard (la tarifa más barata) para borradores, por género
+VOCES_BORRADOR = {
+    'MALE': 'es-ES-Standard-B',
+    'FEMALE': 'es-ES-Standard-A',
+}
+
+def _moviepy_logger(progress):
+    """Returns a proglog logger that forwards MoviePy's frame progress to ``progress``."""
+    import proglog
+
+    class _MoviePyProgress(proglog.ProgressBarLogger):
+        def bars_callback(self, bar, attr, value, old_value=None):
+            if bar == 't' and attr == 'index' and self.bars[bar]['total']:
+                progress(value / self.bars[bar]['total'])
+
+    return _MoviePyProgress()
+
+
+def create_text_image(text, size=IMAGE_SIZE_TEXT, font_size=DEFAULT_FONT_SIZE,
+                      bg_color="black", text_color="white", background_image=None,
+                      stretch_background=False, full_size_background=False, renderer=None):
+    """Creates a text image with the specified text and styles."""
+    if full_size_background:
+      size = VIDEO_SIZE
+    if renderer is None:
+        renderer = SlideRenderer(FONT_PATH)
+    return renderer.text_image(text, size, font_size, bg_color=bg_color, text_color=text_color,
+                               background_image=background_image,
+                               stretch_background=stretch_background)
+
+
+def create_subscription_image(logo_url, size=IMAGE_SIZE_SUBSCRIPTION, font_size=60):
+    """Creates an image for the subscription message."""
+    return subscription_card(logo_url, size, font_size, FONT_PATH, LOGO_SIZE)
+    
+def resolver_perfiles(perfiles):
+    """Returns the output profiles as dicts with 'nombre', 'size', 'crf' and 'bitrate'.
+
+    Each entry is either a key of OUTPUT_PROFILES or a dict with those fields.
+    """
+    resueltos = []
+    for perfil in perfiles:
+        if isinstance(perfil, str):
+            if perfil not in OUTPUT_PROFILES:
+                raise Exception(f"Perfil de salida desconocido: {perfil}")
+            perfil = dict(OUTPUT_PROFILES[perfil], nombre=perfil)
+        resueltos.append(dict({'crf': None, 'bitrate': None}, **perfil))
+    return resueltos
+
+
+def ruta_perfil(nombre_salida, perfil):
+    """Returns the path of one rendition of ``nombre_salida``, e.g. video_1080p.mp4."""
+    base, extension = os.path.splitext(nombre_salida)
+    return f"{base}_{perfil}{extension or '.mp4'}"
+
+
+def resolver_voces(voz, voces_adicionales=None, economica=False):
+    """Returns the voices of a render, the main one first, without repeats.
+
+    With ``economica`` each voice is replaced by the Standard voice of its
+    gender (see VOCES_BORRADOR).
+    """
+    voces = [voz] + list(voces_adicionales or [])
+    for v in voces:
+        if v not in VOCES_DISPONIBLES:
+            raise Exception(f"Voz desconocida: {v}")
+    if economica:
+        voces = [VOCES_BORRADOR[VOCES_DISPONIBLES[v]] for v in voces]
+    return list(dict.fromkeys(voces))
+
+
+def ruta_voz(nombre_salida, voz):
+    """Returns the path of the single-voice copy of ``nombre_salida``, e.g. video_es-ES-Standard-B.mp4."""
+    base, extension = os.path.splitext(nombre_salida)
+    return f"{base}_{voz}{extension or '.mp4'}"
+
+
+def segmentar_texto(texto):
+    """Splits the text into sentences and groups them into ~300 character segments."""
+    frases = [f.strip() + "." for f in texto.split('.') if f.strip()]
+    
+    # Agrupamos frases en segmentos
+    segmentos_texto = []
+    segmento_actual = ""
+    for frase in frases:
+      if len(segmento_actual) + len(frase) < 300:
+        segmento_actual += " " + frase
+      else:
+        segmentos_texto.append(segmento_actual.strip())
+        segmento_actual = frase
+    segmentos_texto.append(segmento_actual.strip())
+    return segmentos_texto
+
+
+def configurar_voz(voz, audio_pcm=False):
+    """Builds the TTS voice and audio config for a voice name."""
+    from google.cloud import texttospeech
+
+    voice = texttospeech.VoiceSelectionParams(
+        language_code="es-ES",
+        name=voz,
+        ssml_gender=texttospeech.SsmlVoiceGender[VOCES_DISPONIBLES[voz]]
+    )
+    if audio_pcm:
+        audio_config = texttospeech.AudioConfig(
+            audio_encoding=texttospeech.AudioEncoding.LINEAR16,
+            sample_rate_hertz=AUDIO_SAMPLE_RATE
+        )
+    else:
+        audio_config = texttospeech.AudioConfig(
+            audio_encoding=texttospeech.AudioEncoding.MP3
+        )
+    return voice, audio_config
+
+
+def _render_progresivo(client, segmentos_texto, voice, audio_config, estilo, logo_url,
+                       nombre_salida, preview_dir, work_dir, audio_pcm, silencio_segmentos,
+                       audio_cache, max_workers_tts, requests_per_minute, tts_lotes, progress,
+                       metricas):
+    """Synthesizes and encodes the video block by block, publishing each block to HLS."""
+    hls = HLSWriter(preview_dir, fps=VIDEO_FPS, preset=VIDEO_PRESET, threads=VIDEO_THREADS)
+    # Cada diapositiva se usa una vez: no guardamos más fotogramas que la línea de tiempo
+    renderer = SlideRenderer(FONT_PATH, max_slides=TIMELINE_WINDOW)
+    total = len(segmentos_texto)
+
+    for inicio in range(0, total, PROGRESSIVE_BLOCK_SEGMENTS):
+        bloque = segmentos_texto[inicio:inicio + PROGRESSIVE_BLOCK_SEGMENTS]
+        with metricas.etapa('sintesis'):
+            audios = sintetizar_segmentos(client, bloque, voice, audio_config,
+                                          max_workers=max_workers_tts,
+                                          requests_per_minute=requests_per_minute,
+                                          cache=audio_cache, lotes=tts_lotes, metricas=metricas)
+        progress('sintesis', inicio + len(bloque), total)
+
+        archivos_bloque = []
+        archivos_audio = []
+        if audio_pcm:
+            narracion, duraciones = concatenar_pcm([decode_linear16(a) for a in audios],
+                                                   silencio=silencio_segmentos)
+            ruta = os.path.join(work_dir, f"temp_narracion_{inicio}.wav")
+            write_wav(ruta, narracion)
+            archivos_audio.append(ruta)
+        else:
+            from moviepy.audio.io.AudioFileClip import AudioFileClip
+
+            duraciones = []
+            for i, audio_content in enumerate(audios, start=inicio):
+                ruta = os.path.join(work_dir, f"temp_audio_{i}.mp3")
+                with open(ruta, "wb") as out:
+                    out.write(audio_content)
+                archivos_audio.append(ruta)
+                audio_clip = AudioFileClip(ruta)
+                duraciones.append(audio_clip.duration)
+                audio_clip.close()
+        archivos_bloque.extend(archivos_audio)
+
+        with metricas.etapa('diapositivas'):
+            slides = []
+            for i, segmento in enumerate(bloque, start=inicio):
+                text_img = create_text_image(segmento, full_size_background=True, renderer=renderer,
+                                             **estilo)
+                ruta = os.path.join(work_dir, f"temp_slide_{i}.png")
+                Image.fromarray(text_img).save(ruta, compress_level=1)
+                slides.append(ruta)
+                progress('diapositivas', i + 1, total)
+        archivos_bloque.extend(slides)
+
+        metricas.medir_disco(archivos_bloque)
+        with metricas.etapa('codificacion'):
+            hls.add_block(slides, duraciones, archivos_audio)
+        metricas.add_frames(int(round(sum(duraciones) * VIDEO_FPS)))
+        progress('codificacion', int(100 * (inicio + len(bloque)) / (total + 1)), 100)
+        # El bloque ya está publicado: liberamos sus temporales
+        for ruta in archivos_bloque:
+            os.remove(ruta)
+
+    subscribe_filename = os.path.join(work_dir, "temp_slide_subscribe.png")
+    Image.fromarray(create_subscription_image(logo_url)).save(subscribe_filename, compress_level=1)
+    with metricas.etapa('codificacion'):
+        hls.add_block([subscribe_filename], [SUBSCRIPTION_DURATION], [])
+        os.remove(subscribe_filename)
+        hls.finalize(nombre_salida)
+    metricas.add_frames(SUBSCRIPTION_DURATION * VIDEO_FPS)
+    metricas.diapositivas = renderer.stats()
+    progress('codificacion', 100, 100)
+
+
+def _render_incremental(client, segmentos_texto, voice, audio_config, estilo, logo_url,
+                        nombre_salida, manifest_dir, work_dir, silencio_segmentos,
+                        audio_cache, max_workers_tts, requests_per_minute, tts_lotes,
+                        encode_workers, progress, metricas):
+    """Re-renders only the segments whose text, voice or style changed since the last render.
+
+    Every segment is encoded as its own video-only chunk whose length is a
+    whole number of frames (the narration is padded to match), so unchanged
+    chunks can be spliced back in as they are.
+    """
+    manifest = RenderManifest(manifest_dir)
+    audios = iter_sintesis(client, segmentos_texto, voice, audio_config,
+                           max_workers=max_workers_tts,
+                           requests_per_minute=requests_per_minute,
+                           cache=audio_cache, lotes=tts_lotes, metricas=metricas,
+                           progress=lambda hechos, total: progress('sintesis', hechos, total))
+
+    estilo_hash = hash_texto(estilo["font_size"], estilo["bg_color"], estilo["text_color"],
+                             hash_archivo(estilo["background_image"]),
+                             estilo["stretch_background"], VIDEO_SIZE, FONT_PATH)
+    voz_hash = hash_texto(voice.name, voice.language_code, int(audio_config.audio_encoding),
+                          audio_config.speaking_rate, silencio_segmentos)
+
+    # Otro render con el mismo nombre de salida espera a que este guarde su manifiesto
+    with manifest.bloqueo():
+        narracion_filename = os.path.join(work_dir, "temp_narracion.wav")
+        try:
+            entradas = []
+            # La narración se escribe a disco segmento a segmento
+            with NarracionWav(narracion_filename) as narracion:
+                for i, audio_content in enumerate(metricas.medir_iter('sintesis', audios)):
+                    segmento = segmentos_texto[i]
+                    muestras = decode_linear16(audio_content)
+                    if silencio_segmentos:
+                        muestras, _ = concatenar_pcm([muestras], silencio=silencio_segmentos)
+                    muestras, frames = pad_to_frames(muestras, VIDEO_FPS)
+                    narracion.append(muestras)
+                    texto_hash = hash_texto(segmento)
+                    entradas.append({
+                        "texto": texto_hash,
+                        "voz": voz_hash,
+                        "estilo": estilo_hash,
+                        "audio": clave_desde_config(segmento, voice, audio_config),
+                        "frames": frames,
+                        "chunk": hash_texto(texto_hash, estilo_hash, frames),
+                    })
+            frames_suscripcion = SUBSCRIPTION_DURATION * VIDEO_FPS
+            entradas.append({
+                "texto": hash_texto("suscripcion", logo_url),
+                "voz": None,
+                "estilo": None,
+                "audio": None,
+                "frames": frames_suscripcion,
+                "chunk": hash_texto("suscripcion", logo_url, frames_suscripcion),
+            })
+
+            pendientes = manifest.diff([e["chunk"] for e in entradas])
+            logging.info(f"Render incremental: {len(entradas) - len(pendientes)} segmentos reutilizados, "
+                         f"{len(pendientes)} por regenerar")
+
+            renderer = SlideRenderer(FONT_PATH, max_slides=TIMELINE_WINDOW)
+
+            def _codificar(slide, entrada):
+                destino = manifest.chunk_path(entrada["chunk"])
+                temporal = destino[:-len(".mp4")] + ".tmp.mp4"
+                try:
+                    encode_video_chunk([slide], [entrada["frames"]], temporal, VIDEO_FPS, VIDEO_PRESET, 1)
+                    os.replace(temporal, destino)
+                finally:
+                    os.remove(slide)
+
+            with metricas.etapa('codificacion'):
+                # Las diapositivas se rasterizan en este hilo; solo ffmpeg corre en paralelo
+                with ThreadPoolExecutor(max_workers=max(1, int(encode_workers or 1))) as pool:
+                    futuros = []
+                    for i in pendientes:
+                        if i < len(segmentos_texto):
+                            frame = create_text_image(segmentos_texto[i], full_size_background=True,
+                                                      renderer=renderer, **estilo)
+                        else:
+                            frame = create_subscription_image(logo_url)
+                        slide = os.path.join(work_dir, f"temp_slide_{i}.png")
+                        Image.fromarray(frame).save(slide, compress_level=1)
+                        futuros.append(pool.submit(_codificar, slide, entradas[i]))
+                    for hechos, futuro in enumerate(futuros, start=1):
+                        futuro.result()
+                        progress('diapositivas', hechos, len(futuros))
+
+                metricas.medir_disco([narracion_filename])
+                total_frames = sum(e["frames"] for e in entradas)
+                mux_chunks([manifest.chunk_path(e["chunk"]) for e in entradas], total_frames / VIDEO_FPS,
+                           [narracion_filename], nombre_salida)
+        finally:
+            if os.path.exists(narracion_filename):
+                os.remove(narracion_filename)
+        # Solo cuentan los fotogramas que se han vuelto a codificar
+        metricas.add_frames(sum(entradas[i]["frames"] for i in pendientes))
+        metricas.diapositivas = renderer.stats()
+        manifest.save(entradas)
+    progress('codificacion', 100, 100)
+
+
+def create_simple_video(texto, nombre_salida, voz, logo_url, font_size, bg_color, text_color,
+                 background_image, stretch_background,
+                 max_workers_tts=TTS_MAX_WORKERS, requests_per_minute=TTS_REQUESTS_PER_MINUTE,
+                 audio_cache=None, backend='moviepy',
+                 encode_workers=ENCODE_WORKERS, audio_pcm=False, silencio_segmentos=0.0,
+                 work_dir=None, progress=None, preview_dir=None, manifest_dir=None,
+                 tts_lotes=False, client=None, metricas=None, perfiles=None,
+                 checkpoint_dir=None, karaoke=False, borrador=False, rango_segmentos=None,
+                 voz_economica=False, movimiento_fondo=False, voces_adicionales=None):
+    """Renders the narrated video for ``texto`` into ``nombre_salida``.
+
+    Temporary files are written to ``work_dir`` (the current directory by
+    default). ``progress`` is called as progress(stage, done, total) with the
+    stages 'sintesis', 'diapositivas' and 'codificacion' (done/total in %).
+    With backend='progresivo' an HLS playlist is published in ``preview_dir``
+    while rendering. With backend='incremental' the render manifest and its
+    chunks are kept in ``manifest_dir`` (renders/<output name> by default).
+    ``tts_lotes`` packs many segments into each TTS request (SSML marks,
+    PCM audio) instead of one request per segment. ``client`` replaces the
+    process-wide Google TTS client (resources.get_registry()), e.g. with
+    the offline stub used by the benchmarks.
+    Stage timings and resource usage are recorded in ``metricas``
+    (a metrics.RenderMetrics) if given.
+
+    ``perfiles`` is a list of output profiles (names of OUTPUT_PROFILES or
+    dicts, see resolver_perfiles). All renditions share one synthesis pass:
+    slides are laid out for each size and the renditions are encoded at the
+    same time, each into ruta_perfil(nombre_salida, name). Only the ffmpeg
+    and paralelo backends support it.
+
+    With ``checkpoint_dir`` the synthesized audio, the slides and the
+    parallel encoder's chunks are kept there as they are produced, so
+    running the same render again after a failure resumes from the last
+    finished segment. The checkpoint is removed when the render succeeds.
+    The incremental backend resumes through its own chunk store and the
+    progressive backend does not checkpoint.
+
+    With backend='subtitulos' the text is not drawn: only the background is
+    encoded, as a still stream, and the segments are carried as a mov_text
+    subtitle track with the same timings. They are also written next to
+    the output as .srt and .vtt files.
+
+    ``karaoke`` highlights the word being spoken, using a TTS mark before
+    every word (v1beta1 client). Only the moviepy backend supports it.
+
+    ``movimiento_fondo`` slowly pans and zooms the background image under
+    the text of every slide (Ken Burns), moviepy backend only. Without a
+    background image the slides stay still.
+
+    ``voces_adicionales`` narrates the same video with more voices. All
+    voices are synthesized at the same time, sharing the request quota,
+    and each slide lasts as long as the longest narration of its segment.
+    The video is encoded once with one audio track per voice, and a
+    single-voice copy of it is made for every voice by stream copy
+    (ruta_voz). Only the ffmpeg, paralelo and subtitulos backends support it.
+
+    ``borrador`` renders a quick draft to check layout and pacing: one
+    DRAFT_SIZE video at DRAFT_FPS with the ffmpeg backend, whatever
+    ``backend`` says, without word highlighting or background motion.
+    Audio comes from the same cache as a final render, so promoting the
+    draft re-synthesizes nothing, unless ``voz_economica`` swapped the
+    voice for the Standard one of the same gender. ``rango_segmentos`` =
+    (start, end) renders only segments[start:end] of the text, draft or not.
+    """
+    work_dir = work_dir or "."
+    if metricas is None:
+        metricas = RenderMetrics()
+    if progress is None:
+        progress = lambda etapa, actual, total: None
+    archivos_temp = []
+    archivos_audio = []
+    duraciones = []
+    cues = []
+    clips_audio = []
+    clips_finales = []
+    metricas.iniciar_muestreo()
+    
+    try:
+        logging.info("Iniciando proceso de creación de video...")
+        fps = VIDEO_FPS
+        if borrador:
+            if perfiles:
+                raise Exception("El borrador no admite versiones de salida")
+            if backend != DRAFT_BACKEND:
+                logging.info(f"Borrador: se usa el motor {DRAFT_BACKEND} en lugar de {backend}")
+            backend, karaoke, movimiento_fondo, fps = DRAFT_BACKEND, False, False, DRAFT_FPS
+        if borrador:
+            salidas = [dict(nombre='borrador', size=DRAFT_SIZE, crf=DRAFT_CRF, bitrate=None,
+                            salida=nombre_salida)]
+        elif perfiles:
+            if backend not in ('ffmpeg', 'paralelo'):
+                raise Exception("Las versiones de salida requieren el motor ffmpeg o paralelo")
+            salidas = resolver_perfiles(perfiles)
+            for salida in salidas:
+                salida['salida'] = ruta_perfil(nombre_salida, salida['nombre'])
+        else:
+            salidas = [dict(nombre='video', size=VIDEO_SIZE, crf=None, bitrate=None, salida=nombre_salida)]
+        voces = resolver_voces(voz, voces_adicionales, economica=borrador and voz_economica)
+        voz = voces[0]
+        if len(voces) > 1 and backend not in VOICE_TRACK_BACKENDS:
+            raise Exception("Varias voces requieren el motor ffmpeg, paralelo o subtitulos")
+        if karaoke and backend != 'moviepy':
+            raise Exception("El resaltado por palabra solo está disponible con el motor MoviePy")
+        if karaoke and tts_lotes:
+            raise Exception("El resaltado por palabra no es compatible con la síntesis por lotes")
+        if movimiento_fondo and backend != 'moviepy':
+            raise Exception("El movimiento del fondo solo está disponible con el motor MoviePy")
+        if movimiento_fondo and karaoke:
+            raise Exception("El movimiento del fondo no es compatible con el resaltado por palabra")
+        if movimiento_fondo and not background_image:
+            logging.info("Sin imagen de fondo no hay movimiento: las diapositivas quedan fijas")
+            movimiento_fondo = False
+        for salida in salidas:
+            salida['slides'] = []
+        if client is None:
+            # Las marcas SSML solo devuelven tiempos en v1beta1
+            client = get_registry().tts_client(beta=tts_lotes or karaoke)
+        
+        tiempo_acumulado = 0
+        
+        with metricas.etapa('segmentacion'):
+            segmentos_texto = segmentar_texto(texto)
+            if rango_segmentos:
+                segmentos_texto = segmentos_texto[slice(*rango_segmentos)]
+                if not segmentos_texto:
+                    raise Exception(f"El rango de segmentos {rango_segmentos} está vacío")
+        if backend == 'incremental' or tts_lotes:
+            # Necesitamos PCM para ajustar cada segmento a un número exacto de fotogramas
+            # o para cortar la respuesta por lotes en las marcas
+            audio_pcm = True
+        configuraciones = [configurar_voz(v, audio_pcm) for v in voces]
+        voice, audio_config = configuraciones[0]
+        
+        # Sintetizamos todos los segmentos en paralelo, respetando la cuota
+        # y reutilizando el audio ya generado para el mismo texto y voz
+        if audio_cache is None:
+            audio_cache = get_default_cache()
+        
+        estilo = dict(font_size=font_size, bg_color=bg_color, text_color=text_color,
+                      background_image=background_image,
+                      stretch_background=stretch_background)
+        if backend == 'incremental':
+            if manifest_dir is None:
+                nombre = os.path.splitext(os.path.basename(nombre_salida))[0]
+                manifest_dir = os.path.join(INCREMENTAL_DIR, nombre)
+            _render_incremental(client, segmentos_texto, voice, audio_config, estilo, logo_url,
+                                nombre_salida, manifest_dir, work_dir, silencio_segmentos,
+                                audio_cache, max_workers_tts, requests_per_minute,
+                                tts_lotes, encode_workers, progress, metricas)
+            logging.info(f"Métricas del render: {metricas.resumen()}")
+            return True, "Video generado exitosamente"
+        
+        if backend == 'progresivo':
+            _render_progresivo(client, segmentos_texto, voice, audio_config, estilo, logo_url,
+                               nombre_salida, preview_dir or os.path.join(work_dir, "hls"),
+                               work_dir, audio_pcm, silencio_segmentos, audio_cache,
+                               max_workers_tts, requests_per_minute, tts_lotes, progress,
+                               metricas)
+            logging.info(f"Métricas del render: {metricas.resumen()}")
+            return True, "Video generado exitosamente"
+        
+        # Un único contexto de render por video: fuente, fondo y diapositivas repetidas.
+        # Cada diapositiva se codifica una vez, así que basta con guardar los fotogramas de la
+        # ventana de la línea de tiempo: el texto de un libro no acumula memoria
+        renderer = SlideRenderer(FONT_PATH, max_slides=TIMELINE_WINDOW)
+        timeline = SlideTimeline()
+
+        def _diapositiva(segmento, size=VIDEO_SIZE):
+            # La letra escala con el lado corto: 1080p y el formato vertical mantienen la proporción
+            escala = min(size) / min(VIDEO_SIZE)
+            return create_text_image(segmento, size=size, renderer=renderer,
+                                     **dict(estilo, font_size=int(round(font_size * escala))))
+
+        def _karaoke(segmento, inicios):
+            # La diapositiva se dibuja una vez; cada palabra solo repinta su recuadro
+            layout = renderer.layout(segmento, VIDEO_SIZE, font_size)
+            slide = KaraokeSlide(_diapositiva(segmento), layout.word_boxes(VIDEO_SIZE), layout.font,
+                                 inicios)
+            return slide.frame
+
+        piramide = []
+
+        def _kenburns(segmento, duracion, i):
+            # El fondo se prepara una vez por video; cada diapositiva solo rasteriza su texto
+            if not piramide:
+                base = renderer.canvas(tamano_base(VIDEO_SIZE), bg_color, background_image,
+                                       stretch_background)
+                piramide.append(Piramide(base, VIDEO_SIZE))
+            slide = KenBurnsSlide(piramide[0], VIDEO_SIZE,
+                                  renderer.text_mask(segmento, VIDEO_SIZE, font_size),
+                                  duracion, text_color, movimiento=i)
+            return slide.frame
+
+        checkpoint = None
+        hechos = set()
+        if checkpoint_dir:
+            checkpoint = RenderCheckpoint(checkpoint_dir, hash_texto(
+                texto, voice.name, voice.language_code, int(audio_config.audio_encoding),
+                audio_config.speaking_rate, estilo, hash_archivo(background_image),
+                [(salida['nombre'], salida['size']) for salida in salidas], FONT_PATH, karaoke,
+                rango_segmentos, movimiento_fondo, voces[1:]))
+            hechos = checkpoint.segmentos_con_audio(len(segmentos_texto), len(voces))
+            if hechos:
+                logging.info(f"Reanudando desde el checkpoint: {len(hechos)} de "
+                             f"{len(segmentos_texto)} segmentos ya sintetizados")
+
+        # Cada segmento se vuelca a disco en cuanto llega: ni el audio ni las
+        # diapositivas del texto completo están en memoria a la vez
+        pendientes = [seg for i, seg in enumerate(segmentos_texto) if i not in hechos]
+        sintetizados = [0] * len(voces)
+
+        def _progreso_voz(k, n, total):
+            sintetizados[k] = n
+            progress('sintesis', len(hechos) + min(sintetizados), len(segmentos_texto))
+
+        # Las voces se sintetizan a la vez y se reparten la cuota de peticiones
+        audios = [metricas.medir_iter('sintesis', iter_sintesis(
+            client, pendientes, voice_k, audio_config_k, max_workers=max_workers_tts,
+            requests_per_minute=requests_per_minute / len(voces), cache=audio_cache,
+            lotes=tts_lotes, metricas=metricas, palabras=karaoke, progress=partial(_progreso_voz, k)))
+            for k, (voice_k, audio_config_k) in enumerate(configuraciones)]
+        narracion_filename = os.path.join(work_dir, "temp_narracion.wav")
+        narraciones_filenames = [narracion_filename] + [os.path.join(work_dir, f"temp_narracion_{k}.wav")
+                                                        for k in range(1, len(voces))]
+        archivos_temp += narraciones_filenames
+        archivos_audio.append(narracion_filename)
+        with ExitStack() as pila:
+            narraciones = [pila.enter_context(NarracionWav(f, silencio=silencio_segmentos))
+                           for f in narraciones_filenames]
+            for i, segmento in enumerate(segmentos_texto):
+                logging.info(f"Procesando segmento {i+1} de {len(segmentos_texto)}")
+                inicios = None
+                pistas = []
+                for k in range(len(voces)):
+                    if i in hechos:
+                        muestras = checkpoint.audio(i, k)
+                        inicios = checkpoint.inicios(i)
+                    else:
+                        audio_content = next(audios[k])
+                        if karaoke:
+                            audio_content, inicios = audio_content
+                        with metricas.etapa('sintesis'):
+                            muestras = (decode_linear16(audio_content) if audio_pcm
+                                        else decode_mp3(audio_content))
+                        del audio_content
+                        if checkpoint:
+                            checkpoint.guardar_audio(i, muestras, inicios, pista=k)
+                    pistas.append(muestras)
+                # La diapositiva dura lo que la narración más larga; las demás voces terminan en silencio
+                largo = max(len(m) for m in pistas)
+                for narracion, muestras in zip(narraciones, pistas):
+                    duracion = narracion.append(np.pad(muestras, (0, largo - len(muestras))))
+                del pistas, muestras
+
+                if backend == 'subtitulos':
+                    # El silencio entre segmentos queda sin subtítulo
+                    cues += dividir_cue(segmento, tiempo_acumulado,
+                                        tiempo_acumulado + max(0.0, duracion - silencio_segmentos))
+
+                if backend in ('ffmpeg', 'paralelo'):
+                    with metricas.etapa('diapositivas'):
+                        # Guardamos la diapositiva una sola vez por versión; ffmpeg la mantiene
+                        # toda su duración
+                        for salida in salidas:
+                            if checkpoint:
+                                slide_filename = checkpoint.slide_path(i, salida['nombre'])
+                                if not os.path.exists(slide_filename):
+                                    checkpoint.guardar_slide(i, salida['nombre'], Image.fromarray(
+                                        _diapositiva(segmento, salida['size'])))
+                            else:
+                                slide_filename = os.path.join(work_dir,
+                                                              f"temp_slide_{salida['nombre']}_{i}.png")
+                                archivos_temp.append(slide_filename)
+                                Image.fromarray(_diapositiva(segmento, salida['size'])).save(
+                                    slide_filename, compress_level=1)
+                            salida['slides'].append(slide_filename)
+                        duraciones.append(duracion)
+                elif karaoke:
+                    timeline.add(partial(_karaoke, segmento, inicios or []), duracion, dinamica=True)
+                elif movimiento_fondo:
+                    timeline.add(partial(_kenburns, segmento, duracion, i), duracion, dinamica=True)
+                elif backend != 'subtitulos':
+                    # MoviePy la rasteriza cuando la codificación llega a ella
+                    timeline.add(partial(_diapositiva, segmento), duracion)
+
+                tiempo_acumulado += duracion
+                progress('diapositivas', i + 1, len(segmentos_texto))
+
+        # Añadir clip de suscripción
+        duracion_subscribe = SUBSCRIPTION_DURATION
+
+        def progreso_codificacion(fraccion):
+            progress('codificacion', int(fraccion * 100), 100)
+
+        # Varias voces: un solo video con una pista de audio por voz
+        pistas_audio = ([([f], v) for f, v in zip(narraciones_filenames, voces)]
+                        if len(voces) > 1 else None)
+
+        with metricas.etapa('codificacion'):
+            if backend in ('ffmpeg', 'paralelo'):
+                duraciones.append(duracion_subscribe)
+                for salida in salidas:
+                    ancho = salida['size'][0]
+                    subscribe_img = create_subscription_image(
+                        logo_url, size=salida['size'],
+                        font_size=int(round(60 * ancho / IMAGE_SIZE_SUBSCRIPTION[0])))
+                    subscribe_filename = os.path.join(work_dir, f"temp_slide_{salida['nombre']}_subscribe.png")
+                    archivos_temp.append(subscribe_filename)
+                    Image.fromarray(subscribe_img).save(subscribe_filename, compress_level=1)
+                    salida['slides'].append(subscribe_filename)
+
+                # Las versiones se codifican a la vez, repartiendo los núcleos entre ellas
+                fracciones = [0.0] * len(salidas)
+                hilos = (VIDEO_THREADS if len(salidas) == 1
+                         else max(1, (os.cpu_count() or 1) // len(salidas)))
+
+                def _codificar(k):
+                    salida = salidas[k]
+
+                    def progreso(fraccion):
+                        fracciones[k] = fraccion
+                        progreso_codificacion(sum(fracciones) / len(fracciones))
+
+                    if backend == 'paralelo':
+                        encode_parallel(salida['slides'], duraciones, archivos_audio, salida['salida'],
+                                        workers=max(1, encode_workers // len(salidas)), fps=fps,
+                                        preset=VIDEO_PRESET, progress=progreso,
+                                        crf=salida['crf'], bitrate=salida['bitrate'],
+                                        chunks_dir=checkpoint.directorio if checkpoint else None,
+                                        pistas_audio=pistas_audio)
+                    else:
+                        encode_still_slides(salida['slides'], duraciones, archivos_audio,
+                                            salida['salida'], fps=fps, preset=VIDEO_PRESET,
+                                            threads=hilos, progress=progreso,
+                                            crf=salida['crf'], bitrate=salida['bitrate'],
+                                            pistas_audio=pistas_audio)
+
+                with ThreadPoolExecutor(max_workers=len(salidas)) as pool:
+                    list(pool.map(_codificar, range(len(salidas))))
+            elif backend == 'subtitulos':
+                # Un solo fondo para toda la narración; el texto va en la pista de subtítulos
+                fondo_filename = os.path.join(work_dir, "temp_fondo.png")
+                subscribe_filename = os.path.join(work_dir, "temp_slide_subscribe.png")
+                archivos_temp += [fondo_filename, subscribe_filename]
+                renderer.canvas(VIDEO_SIZE, bg_color, background_image, stretch_background).save(
+                    fondo_filename, compress_level=1)
+                Image.fromarray(create_subscription_image(logo_url)).save(subscribe_filename,
+                                                                          compress_level=1)
+                srt_filename, _ = escribir_subtitulos(cues, os.path.splitext(nombre_salida)[0])
+                encode_still_slides([fondo_filename, subscribe_filename],
+                                    [tiempo_acumulado, duracion_subscribe], archivos_audio,
+                                    nombre_salida, fps=SUBTITLE_FPS, preset=VIDEO_PRESET,
+                                    threads=VIDEO_THREADS, progress=progreso_codificacion,
+                                    subtitulos=srt_filename, pistas_audio=pistas_audio)
+            else:
+                # MoviePy tarda en cargar: solo lo importamos para este motor
+                from moviepy.audio.io.AudioFileClip import AudioFileClip
+
+                subscribe_img = create_subscription_image(logo_url)
+                timeline.add(lambda: subscribe_img, duracion_subscribe)
+                video_final = timeline.clip()
+                clips_finales.append(video_final)
+                # Una sola pista de audio para todo el video
+                narracion_clip = AudioFileClip(narracion_filename)
+                clips_audio.append(narracion_clip)
+                video_final = video_final.set_audio(narracion_clip)
+
+                video_final.write_videofile(
+                    nombre_salida,
+                    fps=fps,
+                    codec=VIDEO_CODEC,
+                    audio_codec=AUDIO_CODEC,
+                    preset=VIDEO_PRESET,
+                    threads=VIDEO_THREADS,
+                    logger=_moviepy_logger(progreso_codificacion)
+                )
+
+                video_final.close()
+
+            if pistas_audio:
+                # Una copia por voz para publicar por separado, sin volver a codificar
+                for salida in salidas:
+                    for k, v in enumerate(voces):
+                        extraer_pista(salida['salida'], k, ruta_voz(salida['salida'], v))
+
+        metricas.diapositivas = renderer.stats()
+        logging.info(f"Render de diapositivas: {metricas.diapositivas}")
+        fps_salida = SUBTITLE_FPS if backend == 'subtitulos' else fps
+        metricas.add_frames(int(round((tiempo_acumulado + duracion_subscribe) * fps_salida)) * len(salidas))
+        metricas.medir_disco(archivos_temp)
+        logging.info(f"Métricas del render: {metricas.resumen()}")
+        
+        for clip in clips_audio:
+            clip.close()
+        
+        for clip in clips_finales:
+            clip.close()
+
+        if checkpoint:
+            checkpoint.eliminar()
+            
+        for temp_file in archivos_temp:
+            try:
+                if os.path.exists(temp_file):
+                    os.close(os.open(temp_file, os.O_RDONLY))
+                    os.remove(temp_file)
+            except:
+                pass
+        
+        return True, "Video generado exitosamente"
+        
+    except Exception as e:
+        logging.error(f"Error: {str(e)}")
+        # Si el fallo fue del canal, el próximo render lo comprueba antes de usarlo
+        get_registry().sospechoso(client)
+        for clip in clips_audio:
+            try:
+                clip.close()
+            except:
+                pass
+                
+        for clip in clips_finales:
+            try:
+                clip.close()
+            except:
+                pass
+                
+        for temp_file in archivos_temp:
+            try:
+                if os.path.exists(temp_file):
+                    os.close(os.open(temp_file, os.O_RDONLY))
+                    os.remove(temp_file)
+            except:
+                pass
+        
+        return False, str(e)
+    finally:
+        metricas.detener_muestreo()